@@ -0,0 +1,4 @@
+"""Benchmarks for the hot paths of tidymol
+
+Run them with ``python -m benchmarks`` from the root of the repository.
+"""
@@ -0,0 +1,5 @@
+if __name__ == "__main__":
+    import sys
+    from benchmarks.run import main
+
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""The benchmark cases
+
+Every case takes the path of the generated molden file and a scratch
+directory and is timed as a whole. The sidecar index of the file is
+removed before every repetition, so the cases using it include its scan.
+"""
+
+# Standard Library
+import io
+import os
+import subprocess
+import sys
+
+# Third Party Libraries
+import numpy as np
+
+# My Stuff
+from tidymol.dedupe import find_duplicates
+from tidymol.hbond import hydrogen_bonds, scan_hydrogen_bonds
+from tidymol.join import match_labels
+from tidymol.parsers.molden import iter_molecules, parse, read_ensemble
+from tidymol.parsers.molden.index import IndexedMoldenFile, build_index
+from tidymol.parsers.molden.reader import read_chunks
+from tidymol.parsers.molden.writer import write_molden
+from tidymol.pipeline import Pipeline
+from tidymol.replace import parse_rule
+from tidymol.sorting import argsort_energies
+
+CASES = {}
+
+
+def case(function):
+    CASES[function.__name__] = function
+    return function
+
+
+def _read(filename):
+    with open(filename, "r") as infile:
+        return read_ensemble(infile)
+
+
+@case
+def startup(filename, directory):
+    """Cold start of ``tidymol info`` in a new interpreter"""
+    subprocess.run(
+        [sys.executable, "-m", "tidymol", "info", filename],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+@case
+def read(filename, directory):
+    _read(filename)
+
+
+@case
+def strict(filename, directory):
+    with open(filename, "rb") as infile:
+        parse("".join(read_chunks(infile)), strict=True)
+
+
+@case
+def index(filename, directory):
+    with open(os.path.join(directory, "index.tidx"), "w+b") as outfile:
+        build_index(filename, outfile)
+
+
+@case
+def write(filename, directory):
+    molecules = _read(filename)
+    with open(os.path.join(directory, "write.molden"), "w") as outfile:
+        write_molden(outfile, molecules)
+
+
+@case
+def sort(filename, directory):
+    with IndexedMoldenFile(filename) as molecules:
+        order = argsort_energies(molecules.energies)
+        write_molden(io.StringIO(), (molecules[position] for position in order))
+
+
+@case
+def filter(filename, directory):
+    with IndexedMoldenFile(filename) as molecules:
+        labels = molecules.labels
+        mask = match_labels(labels, labels[::2])
+        write_molden(io.StringIO(), molecules.take(np.flatnonzero(mask)))
+
+
+@case
+def mirror(filename, directory):
+    molecules = _read(filename).sorted()
+    write_molden(io.StringIO(), molecules.mirrored(compare=True))
+
+
+@case
+def pipe(filename, directory):
+    with IndexedMoldenFile(filename) as molecules:
+        labels = molecules.labels[::2]
+    with open(filename, "r") as infile:
+        molecules = Pipeline(iter_molecules(infile)).filter(labels).mirror(compare=True).sort()
+        write_molden(io.StringIO(), molecules)
+
+
+@case
+def replace(filename, directory):
+    rules = [parse_rule("Cl:1=Au"), parse_rule("Cl~H:1=Ag")]
+    with open(filename, "r") as infile:
+        write_molden(io.StringIO(), Pipeline(iter_molecules(infile)).replace(rules))
+
+
+@case
+def hbond(filename, directory):
+    hydrogen_bonds(_read(filename), "Cl")
+
+
+@case
+def hbond_sets(filename, directory):
+    scan_hydrogen_bonds(_read(filename), [("Cl", ("O",)), ("O", ("O",)), ("Cl", ("O", "H"))])
+
+
+@case
+def dedupe(filename, directory):
+    # The synthetic frames are all within a few RMSD thresholds of each
+    # other, only the energy window keeps this from comparing all pairs
+    find_duplicates(_read(filename), 0.1, energy_window=1e-5)
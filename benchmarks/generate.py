@@ -0,0 +1,81 @@
+"""Generates synthetic molden files
+
+The frames look like the ones of ``examples/geometry_gibbs_REV_FILTER.molden``:
+a count line, an energy/label line like ``0.003765000         mo_0003.out``
+and the atom lines of a water cluster around a donor atom.
+"""
+
+# Standard Library
+import argparse
+
+# Third Party Libraries
+import numpy as np
+
+LABEL_STYLES = ("out", "plain", "none")
+ENERGY_STYLES = ("gibbs", "zero")
+
+
+def _label(style, index):
+    if style == "out":
+        return "mo_{:04d}.out".format(index)
+    if style == "plain":
+        return "conformer_{}".format(index)
+    return ""
+
+
+def _symbols(atoms, donor):
+    """A donor atom followed by water molecules (O, H, H) and filled up with hydrogens"""
+    symbols = [donor]
+    while len(symbols) < atoms:
+        symbols.extend(["O", "H", "H"][:atoms - len(symbols)])
+    return symbols
+
+
+def generate(outfile, frames=1000, atoms=20, label_style="out", energy_style="gibbs",
+             donor="Cl", seed=0):
+    """Writes a synthetic molden file
+
+    :param outfile: A writable text stream
+    :param frames: The number of frames
+    :param atoms: The number of atoms per frame
+    :param label_style: One of LABEL_STYLES
+    :param energy_style: One of ENERGY_STYLES
+    :param donor: The symbol of the first atom of every frame
+    :param seed: The seed of the random numbers
+    """
+    random = np.random.RandomState(seed)
+    symbols = _symbols(atoms, donor)
+    base = random.uniform(-3.0, 3.0, size=(atoms, 3))
+    energies = np.sort(random.uniform(0.0, 0.05, size=frames))
+    if energy_style == "zero":
+        energies[:] = 0.0
+    labels = random.permutation(frames) + 1
+    for frame in range(frames):
+        coordinates = base + random.normal(scale=0.1, size=(atoms, 3))
+        outfile.write("{}\n".format(atoms))
+        label = _label(label_style, labels[frame])
+        if label_style == "none":
+            outfile.write("\n")
+        else:
+            outfile.write("{:.9f}         {}\n".format(energies[frame], label))
+        for symbol, (x, y, z) in zip(symbols, coordinates):
+            outfile.write("{:<2}{:>16.9f}{:>17.9f}{:>17.9f}\n".format(symbol, x, y, z))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates a synthetic molden file")
+    parser.add_argument("output", help="The path of the molden file")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--atoms", type=int, default=20)
+    parser.add_argument("--label-style", choices=LABEL_STYLES, default="out")
+    parser.add_argument("--energy-style", choices=ENERGY_STYLES, default="gibbs")
+    parser.add_argument("--donor", default="Cl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    with open(args.output, "w") as outfile:
+        generate(outfile, args.frames, args.atoms, args.label_style, args.energy_style,
+                 args.donor, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Runs the benchmark cases and writes the results as JSON
+
+Example::
+
+    python -m benchmarks --frames 20000 --output results.json
+    python -m benchmarks --frames 20000 --compare results.json
+"""
+
+# Standard Library
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from os.path import join
+
+# Third Party Libraries
+import numpy as np
+
+# My Stuff
+from tidymol import __version__
+from tidymol.parsers.molden.index import index_path
+
+# Local imports
+from .cases import CASES
+from .generate import ENERGY_STYLES, LABEL_STYLES, generate
+
+
+def _remove_index(filename):
+    """Removes the sidecar index, so every repetition of a case pays for its scan"""
+    if os.path.exists(index_path(filename)):
+        os.remove(index_path(filename))
+
+
+def measure(function, filename, directory, repeat):
+    """Returns the wall times of every repetition and the peak of the traced memory"""
+    times = []
+    for _ in range(repeat):
+        _remove_index(filename)
+        start = time.perf_counter()
+        function(filename, directory)
+        times.append(time.perf_counter() - start)
+    _remove_index(filename)
+    tracemalloc.start()
+    try:
+        function(filename, directory)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def run(cases, frames, atoms, label_style, energy_style, repeat):
+    results = {
+        "tidymol": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "parameters": {
+            "frames": frames,
+            "atoms": atoms,
+            "label_style": label_style,
+            "energy_style": energy_style,
+            "repeat": repeat,
+        },
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="tidymol-benchmarks-") as directory:
+        filename = join(directory, "benchmark.molden")
+        with open(filename, "w") as outfile:
+            generate(outfile, frames, atoms, label_style, energy_style)
+        for name in cases:
+            times, peak = measure(CASES[name], filename, directory, repeat)
+            best = min(times)
+            results["cases"][name] = {
+                "times": times,
+                "best": best,
+                "median": statistics.median(times),
+                "peak_memory": peak,
+                "frames_per_second": frames / best if best else None,
+                "atoms_per_second": frames * atoms / best if best else None,
+            }
+    return results
+
+
+def report(results, previous=None, stream=sys.stdout):
+    stream.write("{:<12}{:>12}{:>12}{:>14}{:>10}\n".format(
+        "case", "best [s]", "median [s]", "peak [MiB]", "ratio"))
+    for name, result in results["cases"].items():
+        ratio = ""
+        if previous and name in previous["cases"] and previous["cases"][name]["best"]:
+            ratio = "{:.2f}".format(result["best"] / previous["cases"][name]["best"])
+        stream.write("{:<12}{:>12.4f}{:>12.4f}{:>14.1f}{:>10}\n".format(
+            name, result["best"], result["median"], result["peak_memory"] / 2**20, ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks tidymol")
+    parser.add_argument("cases", nargs="*",
+                        help="The cases to run, all by default: {}".format(", ".join(CASES)))
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--atoms", type=int, default=20)
+    parser.add_argument("--label-style", choices=LABEL_STYLES, default="out")
+    parser.add_argument("--energy-style", choices=ENERGY_STYLES, default="gibbs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Writes the results to this JSON file")
+    parser.add_argument("--compare", help="A JSON file of a previous run")
+    args = parser.parse_args(argv)
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error("unknown cases: {}".format(", ".join(sorted(unknown))))
+
+    results = run(args.cases or list(CASES), args.frames, args.atoms,
+                  args.label_style, args.energy_style, args.repeat)
+    previous = None
+    if args.compare:
+        with open(args.compare, "r") as infile:
+            previous = json.load(infile)
+    report(results, previous)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
@@ -77,6 +77,10 @@ setup(
     ],
 
     install_requires=requires('requirements.txt'),
+    extras_require={
+        'zstd': ['zstandard'],
+        'arrow': ['pyarrow'],
+    },
 
     # Required packages for using "setup.py test"
     setup_requires=['pytest-runner'],
@@ -0,0 +1,20 @@
+"""Location of the files cached by tidymol"""
+
+# Standard Library
+import os
+
+# The environment variable which overrides the cache directory
+CACHE_DIR_ENV = "TIDYMOL_CACHE_DIR"
+
+
+def user_cache_dir(*parts):
+    """Returns the cache directory of tidymol, or a subdirectory of it
+
+    The directory is ``$TIDYMOL_CACHE_DIR`` if set, otherwise
+    ``$XDG_CACHE_HOME/tidymol`` or ``~/.cache/tidymol``. It is not created.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        directory = os.path.join(base, "tidymol")
+    return os.path.join(directory, *parts)
@@ -1,32 +1,26 @@
 #!/usr/bin/env python
 import os
 import sys
-import re
 import argparse
 import datetime
 
+from tidymol.exceptions import LabelMismatch
+from tidymol.relabel import Relabeler, relabel_frames
+
 _version = "1.0.0"
 
 def change_label(in_path, out_path):
-    find_energy = re.compile("(\d+\.\d{9}).*(.*.out)")
-    count = 1
-    with open(in_path, 'r') as in_f, open(out_path, 'w') as out_f:
-        number_of_elements = int(in_f.readline())
-        while number_of_elements:
-            energy_result = find_energy.search(in_f.readline())
-            if energy_result:
-                energy = float(energy_result.group(1))
-            else:
-                print("Could not find any energy for this moelcule.")
-                sys.exit(1)
-            out_f.write("DG={0:.1f}{1}HBr_n3_{2}\n".format(round(energy, 1)," "*8, count))
-            for element in range(number_of_elements):
-                out_f.write(in_f.readline())
-            try:
-                number_of_elements = int(in_f.readline())
-                count +=1
-            except ValueError:
-                number_of_elements = 0
+    relabeler = Relabeler(
+        "DG={energy:.1f}" + " " * 8 + "HBr_n3_{index}",
+        pattern=r"(\d+\.\d{9}).*(.*.out)",
+        require_match=True,
+    )
+    with open(in_path, 'rb') as in_f, open(out_path, 'wb') as out_f:
+        try:
+            relabel_frames(in_f, out_f, relabeler)
+        except LabelMismatch:
+            print("Could not find any energy for this moelcule.")
+            sys.exit(1)
 
 
 def main():
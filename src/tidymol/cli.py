@@ -1,22 +1,43 @@
 """Helps to modify molden files
 """
 # Local imports
-from . import __version__
+from . import __version__, parallel, profiling
+from .compression import detect, open_input, open_output
 from .constants import SYMBOLS
-from .exceptions import EmptyFile, NoMolecules
-from .parsers.molden import parse
+from .dedupe import find_duplicates
+from .exceptions import EmptyFile, LabelMismatch, NoMolecules
+from .hbond import donor_sets, molmod_scan_hydrogen_bonds, scan_hydrogen_bonds
+from .incremental import ResultCache, frame_hashes
+from .join import match_energies, match_labels
+from .parsers.archive import ARCHIVE_SUFFIX, is_archive, read_archive, write_archive
+from .parsers.molden import PLANES, MoleculeEnsemble, iter_molecules, parse, plane_normal, read_ensemble
+from .parsers.molden.follow import follow_batches
+from .parsers.molden.index import IndexedMoldenFile
+from .parsers.molden.reader import read_chunks, read_frames
+from .parsers.molden.writer import write_molden
+from .pipeline import Pipeline
+from .profiling import stage
+from .relabel import Relabeler, relabel_frames
+from .replace import parse_rule
+from .sinks import FORMATS, open_sink
+from .sorting import argsort_energies, lowest_energies
 
 # Standard Library
-import copy
-import re
+import cProfile
+import hashlib
+import json
 import sys
+from contextlib import ExitStack, contextmanager
+from itertools import islice
 from logging import DEBUG, INFO, WARNING
 
 # Third Party Libraries
 import click
-import pandas as pd
+import numpy as np
 from loguru import logger
-from molmod.molecules import Molecule
+
+# The number of frames analysed at once by the streaming analysis commands
+BATCH_SIZE = 1 << 16
 
 LOGLEVELS = {
     0: WARNING,
@@ -25,84 +46,430 @@ LOGLEVELS = {
 }
 
 
-def convert_molecule_to_molmod(molecule):
-    molModMolecule = Molecule(
-        molecule.numbers,
-        molecule.coordinates, molecule.label,
-        symbols=molecule.symbols
-    )
-    molModMolecule.set_default_graph()
-    return molModMolecule
+output_option = click.option(
+    "-o",
+    "--output",
+    "output_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Writes the output to this file instead of stdout.",
+)
 
 
-def output(results):
-    """Prints results
+def output(results, filename=None, threads=1):
+    """Writes results
 
     :param result: The results of the modification
-    :type result: List of molecules
+    :type result: MoleculeEnsemble or iterable of molecules
+    :param filename: The output file, stdout if None. Files ending with
+                     .gz, .bz2, .xz or .zst are compressed.
+    :param threads: The number of compression threads
     :return: None
     """
-    for molecule in results:
-        print(molecule)
-
-
-def read_file(filename):
-    data = ""
-    with open(filename, 'r') as infile:
-        for line in infile.readlines():
-            data += re.sub(r" *$", "", line)
-    if data is None:
-        raise EmptyFile()
-    molecules = parse(data)
-    if molecules is None:
+    with stage("write") as timer, open_output(filename, threads) as outfile:
+        timer.count(*write_molden(outfile, results))
+
+
+def read_file(filename, strict=False):
+    """Reads all molecules of a molden file or an archive
+
+    :param filename: The path of the molden file or the archive
+    :param strict: Validates molden files with the PLY grammar
+    :type strict: bool
+    :return: MoleculeEnsemble
+    """
+    with stage("read_file") as timer:
+        if is_archive(filename):
+            molecules = read_archive(filename)
+        elif strict:
+            with stage("read"), open_input(filename, binary=True) as infile:
+                data = "".join(read_chunks(infile))
+            if not data:
+                raise EmptyFile()
+            molecules = parse(data, strict=True)
+        else:
+            with open_input(filename) as infile:
+                molecules = read_ensemble(infile)
+        timer.count(len(molecules), len(molecules.numbers))
+    if not molecules:
         raise NoMolecules()
-    logger.info("Found %s molecules in %s", len(molecules), filename)
+    logger.info("Found {} molecules in {}", len(molecules), filename)
     return molecules
 
 
+def parse_plane(ctx, param, value):
+    """Converts the --plane option into an axis or a normal vector"""
+    if value in PLANES:
+        return value
+    try:
+        normal = [float(component) for component in value.split(",")]
+        plane_normal(normal)
+    except ValueError:
+        raise click.BadParameter("Use x, y, z or the normal of the plane like 1,1,0")
+    return normal
+
+
+plane_option = click.option(
+    "--plane",
+    default="x",
+    show_default=True,
+    callback=parse_plane,
+    help="The mirror plane through the origin: x, y, z for the plane perpendicular to this axis or its normal like 1,1,0.",  # noqa
+)
+
+
+def parse_rules(ctx, param, value):
+    """Converts the --rule options into the rules of replace.replace_atoms"""
+    try:
+        return [parse_rule(rule) for rule in value]
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+rule_option = click.option(
+    "-r",
+    "--rule",
+    "rules",
+    multiple=True,
+    required=True,
+    callback=parse_rules,
+    help="SYMBOL:N=NEW replaces the N-th SYMBOL atom of every molecule by NEW, "
+    "SYMBOL~NEIGHBOUR:N=NEW the SYMBOL atom which is the N-th closest to any NEIGHBOUR atom. "
+    "Can be given several times.",
+)
+
+filter_file_option = click.option(
+    "-f",
+    "--filter-file",
+    type=click.Path(exists=True),
+    required=True,
+    help="The molden file which is used for filtering.",
+)
+
+exclude_option = click.option(
+    "--exclude",
+    is_flag=True,
+    help="Keeps only the molecules which do not match any molecule of the filter file.",
+)
+
+by_option = click.option(
+    "--by",
+    type=click.Choice(["label", "energy"]),
+    default="label",
+    show_default=True,
+    help="Matches the molecules by their label or by their energy.",
+)
+
+tolerance_option = click.option(
+    "--tolerance",
+    type=float,
+    default=1e-9,
+    show_default=True,
+    help="The maximum difference of two matching energies.",
+)
+
+
+@contextmanager
+def open_frames(filename):
+    """Opens a molden file or an archive for random access to its frames
+
+    Molden files are accessed through their index, archives are memory
+    mapped. Compressed molden files can not be memory mapped and are read
+    completely. All of them provide labels, energies, take and indexing.
+    """
+    if is_archive(filename):
+        molecules = read_archive(filename)
+        if not len(molecules):
+            raise NoMolecules()
+        yield molecules
+    elif detect(filename):
+        yield read_file(filename)
+    else:
+        with IndexedMoldenFile(filename) as molecules:
+            if not len(molecules):
+                raise NoMolecules()
+            yield molecules
+
+
+def iter_file(filename):
+    """Yields the molecules of a molden file or an archive one at a time
+
+    Raises NoMolecules after the end of a file without molecules.
+    """
+    empty = True
+    for molecule in _iter_molecules(filename):
+        empty = False
+        yield molecule
+    if empty:
+        raise NoMolecules()
+
+
+def _iter_molecules(filename):
+    if is_archive(filename):
+        for molecule in read_archive(filename):
+            yield molecule
+    else:
+        with open_input(filename) as infile:
+            molecules = iter_molecules(infile)
+            if not profiling.enabled():
+                for molecule in molecules:
+                    yield molecule
+                return
+            while True:
+                # Only the parsing is timed, not the stages consuming the molecules
+                with stage("read") as timer:
+                    molecule = next(molecules, None)
+                    if molecule is None:
+                        return
+                    timer.count(1, molecule.number_of_atoms)
+                yield molecule
+
+
+def iter_ensembles(filename, strict=False, size=BATCH_SIZE):
+    """Yields the molecules of a molden file or an archive as ensembles of at most size frames
+
+    Molden files are parsed batch by batch unless they are validated with
+    the strict grammar, so only one batch is in memory.
+    """
+    if strict or is_archive(filename):
+        molecules = read_file(filename, strict=strict)
+        for start in range(0, len(molecules), size):
+            yield molecules[start:start + size]
+        return
+    count = 0
+    with open_input(filename) as infile:
+        frames = read_frames(infile)
+        while True:
+            with stage("read") as timer:
+                molecules = MoleculeEnsemble.from_frames(islice(frames, size))
+                timer.count(len(molecules), len(molecules.numbers))
+            if not len(molecules):
+                break
+            count += len(molecules)
+            yield molecules
+    if not count:
+        raise NoMolecules()
+    logger.info("Found {} molecules in {}", count, filename)
+
+
+def result_sink(filename, fileformat, threads, default="table"):
+    """Opens the sink of an analysis command, see sinks.open_sink"""
+    try:
+        return open_sink(filename, fileformat, threads, default)
+    except (RuntimeError, ValueError) as error:
+        raise click.UsageError(str(error))
+
+
+format_option = click.option(
+    "--format",
+    "fileformat",
+    type=click.Choice(FORMATS),
+    help="The format of the results. By default selected by the extension of the output file "
+    "(.csv, .npy, .parquet, .arrow), otherwise a text table. parquet and arrow need pyarrow.",
+)
+
+
 @click.group()
 @click.version_option(__version__, prog_name="tidymol")
 @click.option("-v", "--verbose", count=True, default=0)
+@click.option(
+    "--strict",
+    is_flag=True,
+    help="Validates the molden files with the complete grammar. This is slower than the default reader.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="The number of processes for the analysis of the molecules, 0 uses all CPUs.",
+)
+@click.option(
+    "--compression-threads",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="The number of threads for compressed output files (.gz, .bz2, .xz, .zst).",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    help="Caches the results of shortest-distance and filter per frame. A rerun only analyses new or changed frames.",  # noqa
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=512,
+    show_default=True,
+    help="The size limit of the result cache in MiB, the least recently used results are removed first.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Logs the wall time, the frames and atoms per second and the peak memory of every stage.",
+)
+@click.option(
+    "--profile-json",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Writes the profile as JSON to this file, implies --profile.",
+)
+@click.option(
+    "--profile-stats",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Dumps cProfile statistics to this file, e.g. for pstats or snakeviz, implies --profile.",
+)
 @click.pass_context
-def main(ctx, verbose):
+def main(ctx, verbose, strict, jobs, compression_threads, cache, cache_size, profile, profile_json, profile_stats):
     ctx.ensure_object(dict)
+    ctx.obj["STRICT"] = strict
+    ctx.obj["JOBS"] = jobs
+    ctx.obj["COMPRESSION_THREADS"] = compression_threads
+    ctx.obj["CACHE_SIZE"] = cache_size << 20 if cache else None
     ctx.obj["LOGLEVEL"] = LOGLEVELS.get(min(len(LOGLEVELS) - 1, verbose))
+    profile = profile or bool(profile_json) or bool(profile_stats)
     logger.remove()
-    logger.add(sys.stderr, level=ctx.obj["LOGLEVEL"])
+    # The profile is logged on the info level
+    logger.add(sys.stderr, level=min(ctx.obj["LOGLEVEL"], INFO) if profile else ctx.obj["LOGLEVEL"])
     logger.info(f"tidymol version: {__version__}")
     logger.debug("Python version: {}".format(sys.version.split()[0]))
+    # The batches of the subcommand share one process pool
+    ctx.with_resource(parallel.workers(jobs))
+    if profile:
+        start_profile(ctx, profile_json, profile_stats)
+
+
+def start_profile(ctx, json_file=None, stats_file=None):
+    """Profiles the subcommand and reports the stages when it is finished
+
+    :param ctx: The context of the main group
+    :param json_file: Writes the profile as JSON to this file
+    :param stats_file: Dumps the cProfile statistics to this file
+    """
+    profiler = profiling.enable()
+    statistics = None
+    if stats_file:
+        statistics = cProfile.Profile()
+        statistics.enable()
+
+    def report():
+        if statistics is not None:
+            statistics.disable()
+            statistics.dump_stats(stats_file)
+        profiling.disable()
+        for profiled_stage in profiler.stages:
+            logger.info("Profile {}", profiled_stage)
+        logger.info("Profile total: {:.3f} s", profiler.seconds)
+        if json_file:
+            with open(json_file, "w") as outfile:
+                json.dump(profiler.as_dict(), outfile, indent=2)
+
+    # The resources are closed in reverse order, the subcommand stage ends before the report
+    ctx.call_on_close(report)
+    ctx.with_resource(stage(ctx.invoked_subcommand))
 
 
 @main.command()
 @click.argument("filename", type=click.Path(exists=True))
-def info(filename):
+@click.option(
+    "--follow",
+    is_flag=True,
+    help="Keeps reading the molden file while it is written and prints the number of molecules and the lowest energy whenever new molecules appear.",  # noqa
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="The seconds between two checks for new molecules with --follow.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    help="Stops --follow after this many seconds without new molecules.",
+)
+@output_option
+@click.pass_obj
+def info(obj, filename, follow, interval, timeout, output_file):
     """Prints some basic information about the molden file."""
-    molecules = read_file(filename)
-    click.echo(f"Filename: {filename}")
-    click.echo("=" * len(f"Filename: {filename}"))
-    click.echo("Fileformat: .molden")
-    click.echo(f"Number of Molecules: {len(molecules)}")
+    if follow:
+        if is_archive(filename) or detect(filename):
+            raise click.UsageError("--follow needs an uncompressed molden file")
+        with open_output(output_file, obj["COMPRESSION_THREADS"]) as outfile:
+            count, lowest = 0, None
+            for molecules in follow_batches(filename, interval, timeout):
+                count += len(molecules)
+                for molecule in molecules:
+                    if lowest is None or molecule.energy < lowest.energy:
+                        lowest = molecule
+                if lowest is None:
+                    continue
+                click.echo(
+                    f"Number of Molecules: {count}    "
+                    f"Lowest energy: {lowest.energy:.9f} {lowest.label}", file=outfile
+                )
+                outfile.flush()
+        return
+    if obj["STRICT"]:
+        molecules = read_file(filename, strict=True)
+    else:
+        with open_frames(filename) as molecules:
+            logger.info("Found {} molecules in {}", len(molecules), filename)
+    fileformat = ARCHIVE_SUFFIX if is_archive(filename) else ".molden"
+    compression = detect(filename)
+    if compression:
+        fileformat += f" ({compression})"
+    with open_output(output_file, obj["COMPRESSION_THREADS"]) as outfile:
+        click.echo(f"Filename: {filename}", file=outfile)
+        click.echo("=" * len(f"Filename: {filename}"), file=outfile)
+        click.echo(f"Fileformat: {fileformat}", file=outfile)
+        click.echo(f"Number of Molecules: {len(molecules)}", file=outfile)
 
 
 @main.command()
-@click.option(
-    "-f",
-    "--filter-file",
-    type=click.Path(exists=True),
-    help="The molden file which is used for filtering.",
-)
+@filter_file_option
+@exclude_option
+@by_option
+@tolerance_option
 @click.argument("filename", type=click.Path(exists=True))
-def filter(filter_file, filename):
+@output_option
+@click.pass_obj
+def filter(obj, filter_file, exclude, by, tolerance, filename, output_file):
     """Applies a specific filter on a molden file."""
-    molecules = read_file(filename)
-    molecules_filter = read_file(filter_file)
-    filtered_list = list()
-    for molecule in molecules:
-        for molecule_filter in molecules_filter:
-            if molecule.label == molecule_filter.label:
-                filtered_list.append(molecule)
-                continue
-    output(filtered_list)
+    with ExitStack() as stack:
+        if obj["STRICT"]:
+            molecules = read_file(filename, strict=True)
+            molecules_filter = read_file(filter_file, strict=True)
+        else:
+            # Only the matching frames of the molden file are parsed
+            molecules = stack.enter_context(open_frames(filename))
+            molecules_filter = stack.enter_context(open_frames(filter_file))
+        if by == "label":
+            values, keys = molecules.labels, molecules_filter.labels
+        else:
+            values, keys = molecules.energies, molecules_filter.energies
+
+        def match(positions):
+            if by == "label":
+                return match_labels(values[positions], keys)
+            return match_energies(values[positions], keys, tolerance)
+
+        if obj["CACHE_SIZE"]:
+            parameters = {
+                "by": by,
+                "tolerance": tolerance,
+                "keys": hashlib.sha1(np.sort(np.asarray(keys)).tobytes()).hexdigest(),
+            }
+            cache = ResultCache("filter", parameters, obj["CACHE_SIZE"])
+            mask = cache.merge(
+                frame_hashes(molecules),
+                lambda positions: {"frames": np.arange(len(positions)), "match": match(positions)},
+                frame_column="frames",
+            )["match"]
+        else:
+            mask = match(np.arange(len(molecules)))
+        if exclude:
+            mask = ~mask
+        output(molecules.take(np.flatnonzero(mask)), output_file, obj["COMPRESSION_THREADS"])
 
 
 @main.command()
@@ -111,26 +478,258 @@ def filter(filter_file, filename):
     is_flag=True,
     help="The mirrored and the original molecule will be added both to the output file. This helps to compare it.",  # noqa
 )
+@plane_option
 @click.argument("filename", type=click.Path(exists=True))
-def mirror(compare, filename):
+@output_option
+@click.pass_obj
+def mirror(obj, compare, plane, filename, output_file):
     """Mirrors the moleculs of the molden file."""
-    molecules = read_file(filename)
-    _molecules = list()
-    for molecule in molecules:
-        if compare:
-            _molecules.append(copy.deepcopy(molecule))
-        molecule.mirror()
-        _molecules.append(molecule)
-    _molecules = sorted(_molecules, key=lambda molecule: molecule.energy)
-    output(_molecules)
+    with ExitStack() as stack:
+        if obj["STRICT"]:
+            molecules = read_file(filename, strict=True)
+        else:
+            # Only the frames are read, in sorted order, which are written next
+            molecules = stack.enter_context(open_frames(filename))
+        # A mirrored molecule has the energy of its original molecule, so
+        # sorting first keeps every mirrored molecule after its original one.
+        # Only one batch of sorted frames and its mirror images is in memory.
+        order = argsort_energies(molecules.energies)
+        with stage("write") as timer, open_output(output_file, obj["COMPRESSION_THREADS"]) as outfile:
+            while True:
+                batch = molecules.take(list(islice(order, BATCH_SIZE)))
+                if not len(batch):
+                    break
+                if compare:
+                    batch = batch.mirrored(plane, compare=True)
+                else:
+                    batch.mirror(plane)
+                timer.count(*write_molden(outfile, batch))
 
 
 @main.command()
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    help="Writes only the TOP molecules with the lowest energies.",
+)
+@click.option(
+    "--max-keys",
+    type=click.IntRange(min=1),
+    default=10_000_000,
+    show_default=True,
+    help="The maximum number of energies sorted in memory. Larger files are sorted in chunks on disk.",
+)
 @click.argument("filename", type=click.Path(exists=True))
-def sort(filename):
+@output_option
+@click.pass_obj
+def sort(obj, top, max_keys, filename, output_file):
     """Sorts the the moleculs of the molden file by energy."""
-    molecules = read_file(filename)
-    output(sorted(molecules, key=lambda molecule: molecule.energy))
+    if obj["STRICT"]:
+        molecules = read_file(filename, strict=True).sorted()
+        output(molecules[:top] if top else molecules, output_file, obj["COMPRESSION_THREADS"])
+    elif top:
+        output(lowest_energies(iter_file(filename), top), output_file, obj["COMPRESSION_THREADS"])
+    else:
+        # Only the keys of the index are sorted, the frames are read in sorted order
+        with open_frames(filename) as molecules:
+            order = argsort_energies(molecules.energies, max_keys)
+            output((molecules[position] for position in order), output_file, obj["COMPRESSION_THREADS"])
+
+
+@main.command()
+@click.option(
+    "--threshold",
+    type=click.FloatRange(min=0, min_open=True),
+    default=0.1,
+    show_default=True,
+    help="The maximum RMSD of duplicate molecules after their optimal rotation.",
+)
+@click.option(
+    "--energy-window",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Only molecules whose energies differ by at most this value can be duplicates.",
+)
+@click.option(
+    "--duplicates",
+    "duplicates_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Writes the index and label of every duplicate and of the kept molecule, "
+    "as CSV or by the extension as .npy, .parquet or .arrow.",
+)
+@click.argument("filename", type=click.Path(exists=True))
+@output_option
+@click.pass_obj
+def dedupe(obj, threshold, energy_window, duplicates_file, filename, output_file):
+    """Removes duplicate molecules, of every set of duplicates the one with the lowest energy is kept."""
+    molecules = read_file(filename, strict=obj["STRICT"])
+    representatives, rmsd = find_duplicates(molecules, threshold, energy_window, obj["JOBS"])
+    duplicates = np.flatnonzero(representatives != np.arange(len(molecules)))
+    logger.info("Found {} duplicates in {}", len(duplicates), filename)
+    if duplicates_file:
+        kept = representatives[duplicates]
+        with result_sink(duplicates_file, None, obj["COMPRESSION_THREADS"], default="csv") as sink:
+            sink.write({
+                "molecule": duplicates,
+                "label": molecules.labels[duplicates],
+                "duplicate_of": kept,
+                "duplicate_of_label": molecules.labels[kept],
+                "rmsd": rmsd[duplicates],
+            })
+    output(molecules.take(np.flatnonzero(representatives == np.arange(len(molecules)))),
+           output_file, obj["COMPRESSION_THREADS"])
+
+
+@main.command()
+@click.option(
+    "--match",
+    "pattern",
+    help="A regular expression searched in the energy/label line. "
+    "Its groups are available as {1}, {2}, ... or {name} in the template.",
+)
+@click.option(
+    "--start",
+    type=int,
+    default=1,
+    show_default=True,
+    help="The index of the first molecule.",
+)
+@click.option(
+    "--require-match",
+    is_flag=True,
+    help="Stops if an energy/label line does not match, otherwise the line is kept.",
+)
+@click.argument("filename", type=click.Path(exists=True))
+@click.argument("template")
+@output_option
+@click.pass_obj
+def relabel(obj, pattern, start, require_match, filename, template, output_file):
+    """Rewrites the energy/label line of every molecule.
+
+    TEMPLATE is a Python format string with the fields {index}, {energy},
+    {label} and the groups of --match, e.g. "{energy:.9f}     conformer_{index:04d}".
+    Only these lines are rewritten, the atoms are copied without parsing them.
+    """
+    if is_archive(filename):
+        raise click.UsageError("relabel needs a molden file, convert the archive first")
+    relabeler = Relabeler(template, pattern, start, require_match)
+    with open_input(filename, binary=True) as infile, \
+            open_output(output_file, obj["COMPRESSION_THREADS"], binary=True) as outfile:
+        try:
+            frames = relabel_frames(infile, outfile, relabeler)
+        except (LabelMismatch, IndexError, KeyError) as error:
+            raise click.ClickException(f"Can not relabel {filename}: {error}")
+    if not frames:
+        raise NoMolecules()
+    logger.info("Relabeled {} molecules of {}", frames, filename)
+    if relabeler.mismatches:
+        logger.warning("Kept {} labels which do not match {}", relabeler.mismatches, pattern)
+
+
+@main.command()
+@rule_option
+@click.argument("filename", type=click.Path(exists=True))
+@output_option
+@click.pass_obj
+def replace_atoms(obj, rules, filename, output_file):
+    """Replaces the symbols of selected atoms, e.g. to tell apart equivalent atoms.
+
+    All rules are matched against the original symbols, e.g.
+
+        tidymol replace-atoms -r Cl:1=Au -r Cl:2=Ag in.molden
+    """
+    if obj["STRICT"]:
+        molecules = Pipeline(read_file(filename, strict=True))
+    else:
+        molecules = Pipeline(iter_file(filename))
+    output(molecules.replace(rules), output_file, obj["COMPRESSION_THREADS"])
+
+
+@main.group(chain=True)
+@click.argument("filename", type=click.Path(exists=True))
+@output_option
+def pipe(filename, output_file):
+    """Chains filter, mirror, replace and sort without intermediate files.
+
+    The molden file is read once, passed through the stages in the given
+    order and written once, e.g.
+
+        tidymol pipe -o out.molden in.molden filter -f f.molden mirror --compare sort
+    """
+
+
+@pipe.result_callback()
+@click.pass_obj
+def run_pipe(obj, stages, filename, output_file):
+    if obj["STRICT"]:
+        molecules = Pipeline(read_file(filename, strict=True))
+    else:
+        molecules = Pipeline(iter_file(filename))
+    for pipe_stage in stages:
+        molecules = pipe_stage(molecules)
+    output(molecules.molecules, output_file, obj["COMPRESSION_THREADS"])
+
+
+@pipe.command("filter")
+@filter_file_option
+@exclude_option
+@by_option
+@tolerance_option
+@click.pass_obj
+def pipe_filter(obj, filter_file, exclude, by, tolerance):
+    """Keeps the molecules which match the filter file."""
+    if obj["STRICT"]:
+        molecules_filter = read_file(filter_file, strict=True)
+        keys = molecules_filter.labels if by == "label" else molecules_filter.energies
+    else:
+        with open_frames(filter_file) as molecules_filter:
+            keys = molecules_filter.labels if by == "label" else np.array(molecules_filter.energies)
+    return lambda molecules: molecules.filter(keys, by, exclude, tolerance)
+
+
+@pipe.command("mirror")
+@click.option(
+    "--compare",
+    is_flag=True,
+    help="Every original molecule is followed by its mirrored molecule.",
+)
+@plane_option
+def pipe_mirror(compare, plane):
+    """Mirrors the molecules, unlike the mirror command without sorting them."""
+    return lambda molecules: molecules.mirror(compare, plane)
+
+
+@pipe.command("replace")
+@rule_option
+def pipe_replace(rules):
+    """Replaces the symbols of selected atoms."""
+    return lambda molecules: molecules.replace(rules)
+
+
+@pipe.command("sort")
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    help="Keeps only the TOP molecules with the lowest energies.",
+)
+def pipe_sort(top):
+    """Sorts the molecules by energy."""
+    return lambda molecules: molecules.sort(top)
+
+
+def parse_donors(ctx, param, value):
+    """Converts the --symbol options into (symbol, acceptors) donor sets"""
+    sets = []
+    for text in value:
+        symbol, _, acceptors = text.partition(":")
+        symbols = [symbol.strip()] + [acceptor.strip() for acceptor in acceptors.split(",") if acceptor.strip()]
+        unknown = [symbol for symbol in symbols if symbol not in SYMBOLS]
+        if unknown:
+            raise click.BadParameter("Unknown element symbol '{}'".format(unknown[0]))
+        if acceptors:
+            sets.append((symbols[0], tuple(symbols[1:])))
+        else:
+            sets.extend(donor_sets(symbols[0]))
+    return sets
 
 
 @main.command()
@@ -138,59 +737,82 @@ def sort(filename):
 @click.option(
     "-s",
     "--symbol",
-    type=click.Tuple([str, click.Choice(SYMBOLS)]),
-    help="The symbol",
+    "sets",
+    multiple=True,
+    required=True,
+    callback=parse_donors,
+    help="The symbol of the donor atoms, optionally followed by the acceptor symbols like Au:O,Cl,Ag. "
+    "The acceptors are O by default, the donor symbol is always an acceptor. "
+    "Can be given several times, all donors are analysed in one pass.",
+)
+@click.option(
+    "--max-r1",
+    type=float,
+    help="Skips donor atoms without a hydrogen atom within this distance.",
 )
-def shortest_distance(symbol, filename):
+@click.option(
+    "--max-r2",
+    type=float,
+    help="Skips donor atoms whose hydrogen atom has no acceptor within this distance.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["numpy", "molmod"]),
+    default="numpy",
+    show_default=True,
+    help="molmod restricts the search to the molecular graph and is only meant as a cross check.",
+)
+@output_option
+@format_option
+@click.pass_obj
+def shortest_distance(obj, sets, max_r1, max_r2, backend, filename, output_file, fileformat):
     """Finds the shortest distance of every Hydrogen Bonding"""
-    molecules = read_file(filename)
-    distances = {
-        "molecules": [],
-        "indxs_a": [],
-        "indxs_H": [],
-        "indxs_b": [],
-        "q1s": [],
-        "q2s": [],
-        "types": [],
-    }
-    for indx, molecule in enumerate(molecules):
-        indexes = molecule.get_indexes_by_symbol(symbol)
-        molModMolecule = convert_molecule_to_molmod(molecule)
-        for i in indexes:
-            neighbors_r1 = molModMolecule.graph.neighbors[i]
-            H_neighbors = [
-                (neighbor,  molModMolecule.distance_matrix[i][neighbor])
-                for neighbor in neighbors_r1
-                if molModMolecule.symbols[neighbor] == "H"
-            ]
-            shortest_H = sorted(H_neighbors, key=lambda neighbor: neighbor[1])[0]
-            r1_index = shortest_H[0]
-            r1_distance = shortest_H[1]
-
-            neighbors_r2 = molModMolecule.graph.neighbors[r1_index]
-            neighbors_r2 = list(filter(lambda neighbor: neighbor != i, neighbors_r2))
-            X_neighbors = [
-                (neighbor, molModMolecule.distance_matrix[r1_index][neighbor])
-                for neighbor in neighbors_r2
-                if molModMolecule.symbols[neighbor] == "O"
-                or molModMolecule.symbols[neighbor] == symbol
-            ]
-            shortest_X = sorted(X_neighbors, key=lambda neighbor: neighbor[1])[0]
-            r2_index = shortest_X[0]
-            r2_distance = shortest_X[1]
-
-            q1 = (r1_distance-r2_distance)/2.0
-            q2 = r1_distance+r2_distance
-
-            distances["molecules"].append(indx)
-            distances["indxs_a"].append(i+1)
-            distances["indxs_H"].append(r1_index+1)
-            distances["indxs_b"].append(r2_index+1)
-            distances["q1s"].append(q1)
-            distances["q2s"].append(q2)
-            distances["types"].append(
-                "{}-H-{}".format(symbol, molModMolecule.symbols[r2_index])
-            )
-
-    results = pd.DataFrame(distances)
-    print(results)
+    with result_sink(output_file, fileformat, obj["COMPRESSION_THREADS"]) as sink:
+        if backend == "molmod":
+            sink.write(molmod_scan_hydrogen_bonds(read_file(filename, strict=obj["STRICT"]), sets))
+        elif obj["CACHE_SIZE"]:
+            parameters = {"sets": sets, "max_r1": max_r1, "max_r2": max_r2}
+            cache = ResultCache("shortest-distance", parameters, obj["CACHE_SIZE"])
+            with ExitStack() as stack:
+                if obj["STRICT"]:
+                    molecules = read_file(filename, strict=True)
+                else:
+                    # Only the frames which are not cached are parsed
+                    molecules = stack.enter_context(open_frames(filename))
+                sink.write(cache.merge(frame_hashes(molecules), lambda positions: scan_hydrogen_bonds(
+                    molecules.take(positions), sets, max_r1=max_r1, max_r2=max_r2, jobs=obj["JOBS"]
+                )))
+        else:
+            # The results of every batch are written before the next one is parsed
+            start = 0
+            for molecules in iter_ensembles(filename, obj["STRICT"]):
+                with stage("hydrogen bonds") as timer:
+                    distances = scan_hydrogen_bonds(
+                        molecules, sets, max_r1=max_r1, max_r2=max_r2, jobs=obj["JOBS"]
+                    )
+                    timer.count(len(molecules), len(molecules.numbers))
+                distances["molecules"] += start
+                start += len(molecules)
+                with stage("write results"):
+                    sink.write(distances)
+
+
+@main.command()
+@click.argument("filename", type=click.Path(exists=True))
+@click.argument("output_file", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--to",
+    "fileformat",
+    type=click.Choice(["molden", "archive"]),
+    help=f"The format of the output file. By default archive for files ending with {ARCHIVE_SUFFIX}, otherwise molden.",  # noqa
+)
+@click.pass_obj
+def convert(obj, filename, output_file, fileformat):
+    """Converts between molden files and tidymol archives."""
+    molecules = read_file(filename, strict=obj["STRICT"])
+    if fileformat is None:
+        fileformat = "archive" if output_file.endswith(ARCHIVE_SUFFIX) else "molden"
+    if fileformat == "archive":
+        write_archive(output_file, molecules)
+    else:
+        output(molecules, output_file, obj["COMPRESSION_THREADS"])
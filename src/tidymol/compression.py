@@ -0,0 +1,220 @@
+"""Transparent reading and writing of compressed molden files
+
+Compressed inputs are detected by their magic bytes and decompressed
+chunk-wise while they are parsed: a background thread decompresses the
+next chunks while the reader parses the current one (zlib, bz2 and lzma
+release the GIL), so the decompressed file is never materialised.
+
+Compressed outputs are selected by the file extension. With more than one
+thread the compression runs in parallel: zstd with the threads of the
+``zstandard`` package, gzip and xz with ``pigz`` or ``xz -T`` if these
+programs are installed.
+"""
+
+# Standard Library
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+
+# The size of the decompressed chunks
+CHUNK_SIZE = 1 << 20
+
+# The number of decompressed chunks buffered ahead
+PREFETCH = 4
+
+MAGICS = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+SUFFIXES = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+
+def detect(filename):
+    """Returns the compression of the file or None"""
+    with open(filename, "rb") as infile:
+        head = infile.read(8)
+    for magic, compression in MAGICS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def compression_of(filename):
+    """Returns the compression selected by the extension of filename or None"""
+    for suffix, compression in SUFFIXES.items():
+        if filename.endswith(suffix):
+            return compression
+    return None
+
+
+def _require_zstandard():
+    """Returns the zstandard module, which is only loaded for zstd files"""
+    try:
+        # Third Party Libraries
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compressed files need the zstandard package")
+    return zstandard
+
+
+def _open_decompressed(filename, compression):
+    if compression == "gzip":
+        return gzip.open(filename, "rb")
+    if compression == "bz2":
+        return bz2.open(filename, "rb")
+    if compression == "xz":
+        return lzma.open(filename, "rb")
+    zstandard = _require_zstandard()
+    return zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), closefd=True)
+
+
+class PrefetchReader(io.RawIOBase):
+    """Reads a binary stream in a background thread, chunk by chunk"""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE, prefetch=PREFETCH):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._chunks = queue.Queue(maxsize=prefetch)
+        self._buffer = b""
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._stream.read(self._chunk_size)
+                self._chunks.put(chunk)
+                if not chunk:
+                    return
+        except BaseException as error:
+            self._chunks.put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._eof:
+            chunk = self._chunks.get()
+            if isinstance(chunk, BaseException):
+                raise chunk
+            if not chunk:
+                self._eof = True
+            self._buffer = chunk
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            # Unblocks the thread if it waits for space in the queue
+            while self._thread.is_alive():
+                try:
+                    self._chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._stream.close()
+        super().close()
+
+
+def open_input(filename, chunk_size=CHUNK_SIZE, binary=False):
+    """Opens a plain or compressed molden file for reading, as text unless binary is set"""
+    compression = detect(filename)
+    if compression is None:
+        return open(filename, "rb" if binary else "r")
+    stream = io.BufferedReader(
+        PrefetchReader(_open_decompressed(filename, compression), chunk_size), chunk_size
+    )
+    return stream if binary else io.TextIOWrapper(stream)
+
+
+class _ProcessWriter(io.RawIOBase):
+    """Pipes the written bytes through an external compressor into a file"""
+
+    def __init__(self, command, filename):
+        self._outfile = open(filename, "wb")
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=self._outfile)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._process.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._process.stdin.close()
+            returncode = self._process.wait()
+            self._outfile.close()
+            if returncode:
+                raise OSError("The compressor exited with {}".format(returncode))
+        super().close()
+
+
+def _open_compressed(filename, compression, threads):
+    if compression == "zstd":
+        zstandard = _require_zstandard()
+        compressor = zstandard.ZstdCompressor(threads=threads if threads > 1 else 0)
+        return compressor.stream_writer(open(filename, "wb"), closefd=True)
+    if threads > 1:
+        if compression == "gzip" and shutil.which("pigz"):
+            return _ProcessWriter(["pigz", "-c", "-p", str(threads)], filename)
+        if compression == "xz" and shutil.which("xz"):
+            return _ProcessWriter(["xz", "-c", "-T", str(threads)], filename)
+    if compression == "gzip":
+        return gzip.open(filename, "wb")
+    if compression == "bz2":
+        return bz2.open(filename, "wb")
+    return lzma.open(filename, "wb")
+
+
+def open_output(filename=None, threads=1, binary=False):
+    """Opens the output, compressed if the extension of filename asks for it
+
+    :param filename: The path of the output file, stdout if None or "-"
+    :param threads: The number of compression threads
+    :param binary: Opens the output for bytes instead of text
+    """
+    if filename is None or filename == "-":
+        return _Unclosable(sys.stdout.buffer if binary else sys.stdout)
+    compression = compression_of(filename)
+    if compression is None:
+        return open(filename, "wb" if binary else "w", buffering=CHUNK_SIZE)
+    stream = _open_compressed(filename, compression, threads)
+    if isinstance(stream, _ProcessWriter):
+        stream = io.BufferedWriter(stream, CHUNK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream)
+
+
+class _Unclosable(object):
+    """Lets stdout be used in a with statement without closing it"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self._stream
+
+    def __exit__(self, *args):
+        self._stream.flush()
@@ -0,0 +1,208 @@
+"""Detection of duplicate frames
+
+Two frames are duplicates if their atoms are in the same order and the
+RMSD of their coordinates after the optimal rotation (Kabsch) is at most
+a threshold. Only proper rotations are used, so enantiomers are never
+duplicates.
+
+Comparing all pairs of frames is quadratic, so the frames are hashed into
+cells by invariants which differ by at most the threshold between
+duplicates: the sequence of atomic numbers, the radius of gyration and,
+if a window is given, the energy. Only the frames of a cell and of its
+neighbouring cells are compared. The sorted interatomic distances of two
+duplicates differ by at most twice the RMSD (root mean square), so most
+of these pairs are rejected before they are aligned.
+"""
+
+# Standard Library
+from functools import partial
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .parallel import map_units
+
+# Upper bound of the number of values of a block of pairs
+BLOCK_SIZE = 1 << 22
+
+# Tolerates rounding errors of the bounds
+_EPSILON = 1e-9
+
+
+def kabsch_rmsd(first, second):
+    """Returns the RMSD of pairs of frames after the optimal rotation
+
+    :param first: Centered coordinates of shape (pairs, atoms, 3)
+    :param second: Centered coordinates of shape (pairs, atoms, 3)
+    :return: numpy.ndarray of shape (pairs,)
+    """
+    covariance = np.einsum("pni,pnj->pij", first, second)
+    singular = np.linalg.svd(covariance, compute_uv=False)
+    # A reflection is not a rotation
+    singular[:, -1] *= np.sign(np.linalg.det(covariance))
+    squared = (
+        np.einsum("pni,pni->p", first, first) + np.einsum("pni,pni->p", second, second)
+        - 2 * singular.sum(axis=1)
+    ) / first.shape[1]
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def _centered(ensemble, frames, atoms):
+    rows = ensemble.offsets[frames][:, None] + np.arange(atoms)[None, :]
+    coordinates = ensemble.coordinates[rows]
+    return coordinates - coordinates.mean(axis=1, keepdims=True)
+
+
+def _fingerprints(coordinates):
+    """Returns the sorted interatomic distances of (frames, atoms, 3) coordinates"""
+    first, second = np.triu_indices(coordinates.shape[1], 1)
+    distances = np.linalg.norm(coordinates[:, first] - coordinates[:, second], axis=-1)
+    distances.sort(axis=1)
+    return distances
+
+
+def _radii_of_gyration(coordinates):
+    return np.sqrt(np.einsum("fni,fni->f", coordinates, coordinates) / coordinates.shape[1])
+
+
+def _pairs(cells, size):
+    """Yields the candidate pairs of the cells in blocks of about size pairs"""
+    block, count = [], 0
+    for first, second, ordered in cells:
+        i, j = np.indices((len(first), len(second))).reshape(2, -1)
+        i, j = first[i], second[j]
+        if ordered:
+            i, j = i[i < j], j[i < j]
+        block.append((i, j))
+        count += len(i)
+        if count >= size:
+            yield tuple(np.concatenate(column) for column in zip(*block))
+            block, count = [], 0
+    if block:
+        yield tuple(np.concatenate(column) for column in zip(*block))
+
+
+def _compare(ensemble, unit, threshold, energy_window):
+    """Returns the pairs of duplicate frames of a work unit of cells"""
+    atoms, cells, size = unit
+    frames = np.unique(np.concatenate([cell for first, second, _ in cells for cell in (first, second)]))
+    centered = _centered(ensemble, frames, atoms)
+    fingerprints = _fingerprints(centered)
+    radii = _radii_of_gyration(centered)
+    energies = ensemble.energies[frames]
+    # The frames of the cells are replaced by their positions in frames
+    cells = [(np.searchsorted(frames, first), np.searchsorted(frames, second), ordered)
+             for first, second, ordered in cells]
+
+    limit = (2 * threshold) ** 2 * (1 + _EPSILON) * fingerprints.shape[1]
+    duplicates = []
+    for i, j in _pairs(cells, size):
+        valid = np.abs(radii[i] - radii[j]) <= threshold * (1 + _EPSILON)
+        if energy_window is not None:
+            valid &= np.abs(energies[i] - energies[j]) <= energy_window
+        i, j = i[valid], j[valid]
+        difference = fingerprints[i] - fingerprints[j]
+        valid = np.einsum("pd,pd->p", difference, difference) <= limit
+        i, j = i[valid], j[valid]
+        if not len(i):
+            continue
+        rmsd = kabsch_rmsd(centered[i], centered[j])
+        valid = rmsd <= threshold
+        duplicates.append((frames[i[valid]], frames[j[valid]], rmsd[valid]))
+    if not duplicates:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return tuple(np.concatenate(column) for column in zip(*duplicates))
+
+
+def _cell_pairs(cells, neighbours, size):
+    """Yields (first, second, ordered) of the compared cells, large ones in row blocks
+
+    ordered restricts the pairs to first < second, for the pairs of a cell with itself.
+    """
+    for key, cell in cells.items():
+        rows = max(1, size // len(cell))
+        for start in range(0, len(cell) - 1, rows):
+            yield cell[start:start + rows], cell[start + 1:], True
+        for offset in neighbours:
+            neighbour = cells.get(tuple(a + b for a, b in zip(key, offset)))
+            if neighbour is None:
+                continue
+            rows = max(1, size // len(neighbour))
+            for start in range(0, len(cell), rows):
+                yield cell[start:start + rows], neighbour, False
+
+
+def _units(ensemble, threshold, energy_window):
+    """Hashes the frames into cells and collects the compared cells into work units"""
+    units = []
+    for numbers, frames in ensemble.groups():
+        atoms = len(numbers)
+        size = max(1, BLOCK_SIZE // (atoms * (atoms - 1) // 2 + atoms * 3))
+        radii = _radii_of_gyration(_centered(ensemble, frames, atoms))
+        keys = [np.floor(radii / threshold).astype(np.int64)]
+        neighbours = [(1,)]
+        if energy_window is not None:
+            keys.append(np.floor(ensemble.energies[frames] / energy_window).astype(np.int64))
+            neighbours = [(0, 1), (1, -1), (1, 0), (1, 1)]
+        cells = {}
+        for key, frame in zip(zip(*[key.tolist() for key in keys]), frames.tolist()):
+            cells.setdefault(key, []).append(frame)
+        cells = {key: np.array(value, dtype=np.int64) for key, value in cells.items()}
+        unit, count = [], 0
+        for first, second, ordered in _cell_pairs(cells, neighbours, size):
+            unit.append((first, second, ordered))
+            count += len(first) * len(second)
+            if count >= size:
+                units.append((atoms, unit, size))
+                unit, count = [], 0
+        if unit:
+            units.append((atoms, unit, size))
+    return units
+
+
+def _representatives(energies, first, second, rmsd):
+    """Assigns every duplicate to the kept frame with the lowest energy"""
+    order = np.argsort(energies, kind="stable")
+    rank = np.empty(len(energies), dtype=np.int64)
+    rank[order] = np.arange(len(energies))
+    swap = rank[first] > rank[second]
+    first, second = np.where(swap, second, first), np.where(swap, first, second)
+    representatives = np.arange(len(energies))
+    distances = np.zeros(len(energies))
+    # The frames are resolved in the order of their energies, so the state
+    # of the earlier frame of every pair is already final
+    for index in np.lexsort((rank[first], rank[second])).tolist():
+        kept, duplicate = int(first[index]), int(second[index])
+        if representatives[duplicate] == duplicate and representatives[kept] == kept:
+            representatives[duplicate] = kept
+            distances[duplicate] = rmsd[index]
+    return representatives, distances
+
+
+def find_duplicates(ensemble, threshold=0.1, energy_window=None, jobs=1):
+    """Finds the duplicate frames of an ensemble
+
+    Of every set of duplicates the frame with the lowest energy is kept.
+
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param threshold: The maximum RMSD of duplicates
+    :param energy_window: The maximum energy difference of duplicates, None compares all energies
+    :param jobs: The number of processes
+    :return: (representatives, rmsd), for every frame the index of the kept frame,
+             which is the frame itself if it is unique, and the RMSD to it
+    """
+    if threshold <= 0:
+        raise ValueError("The RMSD threshold has to be positive")
+    if energy_window is not None and energy_window <= 0:
+        raise ValueError("The energy window has to be positive")
+    units = _units(ensemble, threshold, energy_window)
+    function = partial(_compare, threshold=threshold, energy_window=energy_window)
+    results = map_units(function, ensemble, units, jobs)
+    if results:
+        first, second, rmsd = (np.concatenate(column) for column in zip(*results))
+    else:
+        first = second = np.zeros(0, dtype=np.int64)
+        rmsd = np.zeros(0)
+    return _representatives(np.asarray(ensemble.energies), first, second, rmsd)
@@ -9,3 +9,11 @@ class EmptyFile(ValueError):
 
 class NoMolecules(ValueError):
     pass
+
+
+class InvalidArchive(ValueError):
+    pass
+
+
+class LabelMismatch(ValueError):
+    pass
@@ -0,0 +1,260 @@
+"""Hydrogen bond geometry of all frames of an ensemble
+
+For every donor atom X the closest hydrogen H is searched (r1) and for
+that hydrogen the closest acceptor Y other than X (r2). The proton
+transfer coordinates are ``q1 = (r1 - r2) / 2`` and ``q2 = r1 + r2``.
+
+Frames with the same sequence of atomic numbers are processed together
+as one (frames, atoms, 3) block, so the distances of all donors of all
+frames of a block are computed with a few NumPy operations.
+"""
+
+# Standard Library
+from functools import partial
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .constants import NUMBERS, SYMBOLS
+from .parallel import map_ensemble
+from .parsers.molden import symbol_mask
+from .profiling import stage
+
+COLUMNS = ("molecules", "indxs_a", "indxs_H", "indxs_b", "q1s", "q2s", "types")
+
+# The type of a hydrogen bond like "Cl-H-Br" has at most seven characters,
+# a fixed width keeps the column type of all batches the same
+TYPE_DTYPE = "U7"
+
+# Upper bound of the number of distances computed at once
+BLOCK_SIZE = 1 << 22
+
+_HYDROGEN = NUMBERS["H"]
+
+_SYMBOLS = np.array(SYMBOLS)
+
+
+def _empty():
+    return {
+        "molecules": np.zeros(0, dtype=np.int64),
+        "indxs_a": np.zeros(0, dtype=np.int64),
+        "indxs_H": np.zeros(0, dtype=np.int64),
+        "indxs_b": np.zeros(0, dtype=np.int64),
+        "q1s": np.zeros(0, dtype=np.float64),
+        "q2s": np.zeros(0, dtype=np.float64),
+        "types": np.zeros(0, dtype=TYPE_DTYPE),
+    }
+
+
+def _concatenate(results):
+    results = [result for result in results if len(result["molecules"])]
+    if not results:
+        return _empty()
+    return {column: np.concatenate([result[column] for result in results]) for column in COLUMNS}
+
+
+def _block(coordinates, frames, hydrogens, atoms, sets, max_r1, max_r2):
+    """Computes the hydrogen bonds of all donor sets of a (frames, atoms, 3) block of coordinates
+
+    :param hydrogens: The indexes of the hydrogen atoms
+    :param atoms: The indexes of all donor and acceptor atoms
+    :param sets: (donors, acceptors) of every donor set as positions in atoms
+    """
+    # The distances of every hydrogen to every donor and acceptor, shared by all sets
+    distances = np.linalg.norm(
+        coordinates[:, hydrogens, None, :] - coordinates[:, None, atoms, :], axis=-1
+    )
+    for donors, acceptors in sets:
+        # r1: the closest hydrogen of every donor
+        r1s = distances[:, :, donors].transpose(0, 2, 1)
+        r1s[:, atoms[donors][:, None] == hydrogens[None, :]] = np.inf
+        closest_h = np.argmin(r1s, axis=-1)
+        r1 = np.take_along_axis(r1s, closest_h[..., None], axis=-1)[..., 0]
+        indxs_h = hydrogens[closest_h]
+
+        # r2: the closest acceptor of that hydrogen, except the donor itself
+        r2s = np.take_along_axis(distances, closest_h[..., None], axis=1)[..., acceptors]
+        r2s[:, donors[:, None] == acceptors[None, :]] = np.inf
+        r2s[indxs_h[..., None] == atoms[acceptors][None, None, :]] = np.inf
+        closest_y = np.argmin(r2s, axis=-1)
+        r2 = np.take_along_axis(r2s, closest_y[..., None], axis=-1)[..., 0]
+        indxs_b = atoms[acceptors][closest_y]
+
+        valid = np.isfinite(r1) & np.isfinite(r2)
+        if max_r1 is not None:
+            valid &= r1 <= max_r1
+        if max_r2 is not None:
+            valid &= r2 <= max_r2
+        frame_indexes = np.broadcast_to(frames[:, None], r1.shape)
+        donor_indexes = np.broadcast_to(atoms[donors][None, :], r1.shape)
+        yield (frame_indexes[valid], donor_indexes[valid], indxs_h[valid],
+               indxs_b[valid], r1[valid], r2[valid])
+
+
+def donor_sets(symbols, acceptors=("O",)):
+    """Returns the donor sets of symbols, every symbol with the default acceptors"""
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    return [(symbol, tuple(acceptors)) for symbol in symbols]
+
+
+def hydrogen_bonds(ensemble, symbol, acceptors=("O",), max_r1=None, max_r2=None, jobs=1):
+    """Computes q1 and q2 of every donor atom of every frame
+
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param symbol: The element of the donor atoms
+    :param acceptors: The elements of the acceptor atoms in addition to symbol
+    :param max_r1: Skips donors without a hydrogen within this distance
+    :param max_r2: Skips donors whose hydrogen has no acceptor within this distance
+    :param jobs: The number of processes
+    :return: dict of columns, ordered by frame and donor index
+    """
+    return scan_hydrogen_bonds(ensemble, donor_sets(symbol, acceptors), max_r1, max_r2, jobs)
+
+
+def scan_hydrogen_bonds(ensemble, sets, max_r1=None, max_r2=None, jobs=1):
+    """Computes q1 and q2 of several donor sets in one pass over the frames
+
+    The distances of the hydrogens to the donors and acceptors are computed
+    once per frame and shared by all donor sets.
+
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param sets: (symbol, acceptors) of every donor set, the donor symbol is
+                 always an acceptor as well, see donor_sets
+    :param max_r1: Skips donors without a hydrogen within this distance
+    :param max_r2: Skips donors whose hydrogen has no acceptor within this distance
+    :param jobs: The number of processes
+    :return: dict of columns, ordered by frame, donor index and donor set
+    """
+    if jobs != 1:
+        function = partial(scan_hydrogen_bonds, sets=sets, max_r1=max_r1, max_r2=max_r2)
+        results = []
+        for start, result in map_ensemble(function, ensemble, jobs):
+            result["molecules"] += start
+            results.append(result)
+        return _concatenate(results)
+
+    sets = [(symbol, list(acceptors) + [symbol]) for symbol, acceptors in sets]
+    results, order = [], []
+    for numbers, frames in ensemble.groups():
+        hydrogens = np.flatnonzero(numbers == _HYDROGEN)
+        masks = [(symbol_mask(numbers, symbol), symbol_mask(numbers, acceptors)) for symbol, acceptors in sets]
+        atoms = np.flatnonzero(np.any([donors | acceptors for donors, acceptors in masks], axis=0))
+        # The donors and acceptors of every set as positions in atoms
+        positions = [
+            (index, np.flatnonzero(donors[atoms]), np.flatnonzero(acceptors[atoms]))
+            for index, (donors, acceptors) in enumerate(masks)
+        ]
+        positions = [position for position in positions if len(position[1]) and len(position[2])]
+        if not len(hydrogens) or not positions:
+            continue
+        cost = len(numbers) * 3 + len(hydrogens) * len(atoms) * (1 + 4 * len(positions))
+        chunk = max(1, BLOCK_SIZE // cost)
+        for start in range(0, len(frames), chunk):
+            chunk_frames = frames[start:start + chunk]
+            starts = ensemble.offsets[chunk_frames]
+            rows = starts[:, None] + np.arange(len(numbers))[None, :]
+            coordinates = ensemble.coordinates[rows]
+            blocks = _block(
+                coordinates, chunk_frames, hydrogens, atoms,
+                [(donors, acceptors) for _, donors, acceptors in positions], max_r1, max_r2,
+            )
+            for (index, _, _), (frame, donor, hydrogen, acceptor, r1, r2) in zip(positions, blocks):
+                symbols = _SYMBOLS[numbers[acceptor]]
+                results.append({
+                    "molecules": frame,
+                    "indxs_a": donor + 1,
+                    "indxs_H": hydrogen + 1,
+                    "indxs_b": acceptor + 1,
+                    "q1s": (r1 - r2) / 2.0,
+                    "q2s": r1 + r2,
+                    "types": np.char.add("{}-H-".format(sets[index][0]), symbols).astype(TYPE_DTYPE),
+                })
+                order.append(np.full(len(frame), index))
+    result = _concatenate(results)
+    indexes = np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+    order = np.lexsort((indexes, result["indxs_a"], result["molecules"]))
+    return {column: values[order] for column, values in result.items()}
+
+
+def convert_molecule_to_molmod(molecule):
+    # Third Party Libraries
+    from molmod.molecules import Molecule
+
+    molModMolecule = Molecule(
+        molecule.numbers,
+        molecule.coordinates, molecule.label,
+        symbols=molecule.symbols
+    )
+    molModMolecule.set_default_graph()
+    return molModMolecule
+
+
+def molmod_hydrogen_bonds(ensemble, symbol, acceptors=("O",)):
+    """Computes q1 and q2 with the molecular graph of molmod
+
+    The hydrogens and acceptors are restricted to the neighbors in the
+    molecular graph. This is much slower than :func:`hydrogen_bonds` and
+    meant as a cross check.
+    """
+    return molmod_scan_hydrogen_bonds(ensemble, donor_sets(symbol, acceptors))
+
+
+def molmod_scan_hydrogen_bonds(ensemble, sets):
+    """Computes q1 and q2 of several donor sets with the molecular graph of molmod
+
+    The graph of every molecule is built once and shared by all donor sets,
+    see :func:`scan_hydrogen_bonds`.
+    """
+    sets = [(symbol, set(acceptors) | {symbol}) for symbol, acceptors in sets]
+    distances = {column: [] for column in COLUMNS}
+    for indx, molecule in enumerate(ensemble):
+        donors = sorted(
+            (int(i), index)
+            for index, (symbol, _) in enumerate(sets)
+            for i in molecule.get_indexes_by_symbol(symbol)
+        )
+        if not donors:
+            continue
+        with stage("molmod graph") as timer:
+            molModMolecule = convert_molecule_to_molmod(molecule)
+            timer.count(1, molecule.number_of_atoms)
+        for i, index in donors:
+            symbol, acceptors = sets[index]
+            neighbors_r1 = molModMolecule.graph.neighbors[i]
+            H_neighbors = [
+                (neighbor,  molModMolecule.distance_matrix[i][neighbor])
+                for neighbor in neighbors_r1
+                if molModMolecule.symbols[neighbor] == "H"
+            ]
+            shortest_H = sorted(H_neighbors, key=lambda neighbor: neighbor[1])[0]
+            r1_index = shortest_H[0]
+            r1_distance = shortest_H[1]
+
+            neighbors_r2 = molModMolecule.graph.neighbors[r1_index]
+            neighbors_r2 = list(filter(lambda neighbor: neighbor != i, neighbors_r2))
+            X_neighbors = [
+                (neighbor, molModMolecule.distance_matrix[r1_index][neighbor])
+                for neighbor in neighbors_r2
+                if molModMolecule.symbols[neighbor] in acceptors
+            ]
+            shortest_X = sorted(X_neighbors, key=lambda neighbor: neighbor[1])[0]
+            r2_index = shortest_X[0]
+            r2_distance = shortest_X[1]
+
+            q1 = (r1_distance-r2_distance)/2.0
+            q2 = r1_distance+r2_distance
+
+            distances["molecules"].append(indx)
+            distances["indxs_a"].append(i+1)
+            distances["indxs_H"].append(r1_index+1)
+            distances["indxs_b"].append(r2_index+1)
+            distances["q1s"].append(q1)
+            distances["q2s"].append(q2)
+            distances["types"].append(
+                "{}-H-{}".format(symbol, molModMolecule.symbols[r2_index])
+            )
+    return distances
@@ -0,0 +1,166 @@
+"""Caches per frame results of the analysis commands between runs
+
+The results of a command are stored per frame, keyed by a digest of the
+frame and by the parameters of the command. When a command runs again on
+a file which got new frames appended, only the new frames are parsed and
+analysed and their results are merged with the cached ones.
+
+Every combination of command and parameters is one ``.npz`` file below
+``user_cache_dir("results")``. It holds the digests of the frames and the
+result columns, one of them refers to the frames. The least recently used
+files are removed when the cache grows beyond its size limit.
+"""
+
+# Standard Library
+import hashlib
+import json
+import os
+
+# Third Party Libraries
+import numpy as np
+from loguru import logger
+
+# Local imports
+from . import __version__
+from .cache import user_cache_dir
+from .parsers.molden.index import HASH_SIZE
+
+# The default size limit of the cache in bytes
+MAX_SIZE = 512 << 20
+
+_HASHES = "__hashes__"
+
+
+def frame_hashes(molecules):
+    """Returns the digests of the frames of an indexed molden file or an ensemble
+
+    An indexed molden file hashes the raw bytes of its frames, an ensemble
+    the arrays of its frames.
+    """
+    if hasattr(molecules, "hashes"):
+        return molecules.hashes()
+    offsets = molecules.offsets
+    numbers, coordinates = molecules.numbers, molecules.coordinates
+    digests = []
+    for index, (label, energy) in enumerate(zip(molecules.labels.tolist(), molecules.energies.tolist())):
+        first, last = offsets[index], offsets[index + 1]
+        digest = hashlib.blake2b(digest_size=HASH_SIZE)
+        digest.update("{}\0{!r}\0".format(label, energy).encode())
+        digest.update(numbers[first:last].tobytes())
+        digest.update(np.ascontiguousarray(coordinates[first:last]).tobytes())
+        digests.append(digest.digest())
+    return np.array(digests, dtype="S{}".format(HASH_SIZE))
+
+
+def _gather(columns, frame_column, frames, selected, positions):
+    """Returns the rows of the selected frames, their frame column set to positions"""
+    order = np.argsort(columns[frame_column], kind="stable")
+    counts = np.bincount(columns[frame_column], minlength=frames)
+    starts = np.concatenate([[0], np.cumsum(counts)])
+    counts = counts[selected]
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    rows = order[np.repeat(starts[selected] - offsets[:-1], counts) + np.arange(offsets[-1])]
+    gathered = {name: values[rows] for name, values in columns.items()}
+    gathered[frame_column] = np.repeat(positions, counts)
+    return gathered
+
+
+class ResultCache(object):
+    """The cached per frame results of one command with one set of parameters
+
+    :param command: The name of the command
+    :param parameters: The JSON serialisable parameters which change the results
+    :param max_size: The size limit of the whole cache in bytes
+    :param directory: The cache directory, by default ``user_cache_dir("results")``
+    """
+
+    def __init__(self, command, parameters, max_size=MAX_SIZE, directory=None):
+        key = json.dumps([command, parameters, __version__], sort_keys=True)
+        self._directory = directory or user_cache_dir("results")
+        self._path = os.path.join(
+            self._directory, "{}-{}.npz".format(command, hashlib.sha1(key.encode()).hexdigest())
+        )
+        self._max_size = max_size
+
+    @property
+    def path(self):
+        return self._path
+
+    def load(self):
+        """Returns the cached digests and result columns, or None"""
+        try:
+            with np.load(self._path, allow_pickle=False) as data:
+                columns = {name: data[name] for name in data.files}
+        except (OSError, ValueError) as error:
+            if os.path.exists(self._path):
+                logger.warning("Ignoring the broken cache file {}: {}", self._path, error)
+            return None
+        os.utime(self._path)
+        return columns.pop(_HASHES), columns
+
+    def save(self, hashes, columns):
+        os.makedirs(self._directory, exist_ok=True)
+        temporary = "{}.{}.tmp.npz".format(self._path[:-len(".npz")], os.getpid())
+        np.savez(temporary, **{_HASHES: hashes}, **columns)
+        os.replace(temporary, self._path)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits into max_size"""
+        entries = []
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            if name.endswith(".npz") and ".tmp." not in name:
+                status = os.stat(path)
+                entries.append((status.st_mtime, status.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self._max_size or path == self._path:
+                continue
+            os.remove(path)
+            size -= entry_size
+
+    def merge(self, hashes, compute, frame_column="molecules"):
+        """Returns the results of all frames, computing only the frames which are not cached
+
+        :param hashes: The digests of the frames, see frame_hashes
+        :param compute: A function which takes the positions of the frames
+                        which are not cached and returns their result columns.
+                        The frame column of these results refers to the
+                        position in the given positions.
+        :param frame_column: The name of the column with the frame of every row
+        :return: dict of columns, the rows ordered by frame
+        """
+        cached = self.load()
+        if cached is None:
+            cached_hashes, cached_columns = np.zeros(0, dtype=hashes.dtype), None
+        else:
+            cached_hashes, cached_columns = cached
+        known = {digest: index for index, digest in enumerate(cached_hashes.tolist())}
+
+        # Identical frames are computed once
+        unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        stored = np.array([known.get(digest, -1) for digest in unique.tolist()], dtype=np.int64)
+        missing = np.flatnonzero(stored < 0)
+        logger.info("{} of {} frames are cached", np.count_nonzero(stored[inverse] >= 0), len(hashes))
+
+        if len(missing) or cached_columns is None:
+            computed = compute(np.sort(first[missing]))
+            # compute got the positions in file order, the frames are stored in this order
+            missing = missing[np.argsort(first[missing], kind="stable")]
+            computed[frame_column] = np.asarray(computed[frame_column], dtype=np.int64) + len(cached_hashes)
+            stored[missing] = len(cached_hashes) + np.arange(len(missing))
+            cached_hashes = np.concatenate([cached_hashes, unique[missing]])
+            if cached_columns is None:
+                cached_columns = computed
+            else:
+                cached_columns = {
+                    name: np.concatenate([values, computed[name]])
+                    for name, values in cached_columns.items()
+                }
+            self.save(cached_hashes, cached_columns)
+
+        return _gather(
+            cached_columns, frame_column, len(cached_hashes),
+            stored[inverse.reshape(-1)], np.arange(len(hashes)),
+        )
@@ -0,0 +1,33 @@
+"""Joins the frames of two molden files on their labels or energies"""
+
+# Third Party Libraries
+import numpy as np
+
+
+def match_labels(labels, keys):
+    """Returns a boolean mask of the labels which occur in keys
+
+    :param labels: The labels of the frames which are filtered
+    :param keys: The labels of the filter
+    :return: numpy.ndarray of bools, one for every label
+    """
+    keys = set(keys)
+    return np.fromiter((label in keys for label in labels), dtype=bool, count=len(labels))
+
+
+def match_energies(energies, keys, tolerance):
+    """Returns a boolean mask of the energies which are within tolerance of any key
+
+    :param energies: The energies of the frames which are filtered
+    :param keys: The energies of the filter
+    :param tolerance: The maximum absolute difference of two matching energies
+    :return: numpy.ndarray of bools, one for every energy
+    """
+    energies = np.asarray(energies, dtype=np.float64)
+    keys = np.sort(np.asarray(keys, dtype=np.float64))
+    if not len(keys):
+        return np.zeros(len(energies), dtype=bool)
+    right = np.clip(np.searchsorted(keys, energies), 0, len(keys) - 1)
+    left = np.clip(right - 1, 0, len(keys) - 1)
+    distance = np.minimum(np.abs(keys[left] - energies), np.abs(keys[right] - energies))
+    return distance <= tolerance
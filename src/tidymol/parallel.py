@@ -0,0 +1,184 @@
+"""Runs per frame work of an ensemble in a process pool
+
+The arrays of the ensemble are copied once into shared memory blocks.
+Every worker attaches to these blocks when it gets the first unit of the
+ensemble and only the names of the blocks, the work units, e.g. (start,
+stop) ranges of frames, and the results are sent between the processes.
+Within :func:`workers` all ensembles, e.g. the batches of a large file,
+are processed by the same pool. The results are returned in the order of the frames, so
+the output is identical to the serial path.
+"""
+
+# Standard Library
+import math
+import multiprocessing
+import os
+from contextlib import contextmanager
+from functools import partial
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .parsers.molden import MoleculeEnsemble
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+# The attached ensemble of the worker process
+_WORKER = {}
+
+# The pool of the running command, see workers
+_WORKERS = None
+
+
+def cpu_count(jobs):
+    """Returns the number of processes for the --jobs option, 0 means all CPUs"""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def _share(array, blocks):
+    if not array.nbytes:
+        return (None, array.shape, array.dtype.str)
+    block = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return (block.name, array.shape, array.dtype.str)
+
+
+def _attach(shared, blocks):
+    name, shape, dtype = shared
+    if name is None:
+        return np.zeros(shape, dtype=np.dtype(dtype))
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _initialize(function, labels, energies, numbers, coordinates, offsets):
+    _WORKER["function"] = function
+    _WORKER["ensemble"] = MoleculeEnsemble(labels, energies, numbers, coordinates, offsets)
+
+
+def _run(unit):
+    return _WORKER["function"](_WORKER["ensemble"], unit)
+
+
+def _run_shared(task):
+    function, shared, unit = task
+    if _WORKER.get("shared") != shared:
+        # The first unit of a new ensemble, the blocks of the previous one are released
+        for block in _WORKER.get("blocks", []):
+            block.close()
+        blocks = []
+        _WORKER["blocks"] = blocks
+        _WORKER["shared"] = shared
+        _WORKER["ensemble"] = MoleculeEnsemble(*(_attach(array, blocks) for array in shared))
+    return function(_WORKER["ensemble"], unit)
+
+
+class _Workers(object):
+    """The process pool of a command, started when it is used first"""
+
+    def __init__(self, jobs):
+        self._jobs = cpu_count(jobs)
+        self._pool = None
+
+    def pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._jobs)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+@contextmanager
+def workers(jobs=1):
+    """Runs every map_units call of the with block in the same process pool
+
+    A command which analyses a file batch by batch starts its processes
+    only once. The pool is only started by the first call which needs it.
+
+    :param jobs: The number of processes
+    """
+    global _WORKERS
+    previous, _WORKERS = _WORKERS, _Workers(jobs)
+    try:
+        yield
+    finally:
+        _WORKERS.close()
+        _WORKERS = previous
+
+
+def _map_initialized(function, ensemble, units, jobs):
+    # Without shared memory every call starts a pool which receives the ensemble once per process
+    arguments = (function, ensemble.labels, ensemble.energies, ensemble.numbers, ensemble.coordinates,
+                 ensemble.offsets)
+    with multiprocessing.Pool(min(jobs, len(units)), _initialize, arguments) as pool:
+        return pool.map(_run, units)
+
+
+def map_units(function, ensemble, units, jobs=1):
+    """Applies function to every work unit of the ensemble
+
+    Inside :func:`workers` the pool of the with block is used, otherwise a
+    pool is started for this call.
+
+    :param function: A picklable function which takes the complete
+                     MoleculeEnsemble and a work unit
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param units: The picklable work units, e.g. ranges or indices of frames
+    :param jobs: The number of processes, 1 runs everything in this process
+    :return: List of the results in the order of the units
+    """
+    jobs = cpu_count(jobs)
+    if jobs == 1 or len(units) < 2:
+        return [function(ensemble, unit) for unit in units]
+    if shared_memory is None:
+        return _map_initialized(function, ensemble, units, jobs)
+    if _WORKERS is None:
+        with workers(jobs):
+            return map_units(function, ensemble, units, jobs)
+
+    blocks = []
+    try:
+        shared = tuple(_share(array, blocks) for array in (
+            ensemble.labels, ensemble.energies, ensemble.numbers, ensemble.coordinates, ensemble.offsets
+        ))
+        return _WORKERS.pool().map(_run_shared, [(function, shared, unit) for unit in units])
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _run_range(function, ensemble, unit):
+    start, stop = unit
+    return function(ensemble[start:stop])
+
+
+def map_ensemble(function, ensemble, jobs=1, chunksize=None):
+    """Applies function to consecutive chunks of the ensemble
+
+    :param function: A picklable function which takes a MoleculeEnsemble
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param jobs: The number of processes, 1 runs everything in this process
+    :param chunksize: The number of frames of a work unit
+    :return: List of ``(start, result)`` tuples in the order of the frames
+    """
+    if not chunksize:
+        chunksize = max(1, int(math.ceil(len(ensemble) / (cpu_count(jobs) * 4.0))))
+    units = [(start, min(start + chunksize, len(ensemble)))
+             for start in range(0, len(ensemble), chunksize)]
+    results = map_units(partial(_run_range, function), ensemble, units, jobs)
+    return [(unit[0], result) for unit, result in zip(units, results)]
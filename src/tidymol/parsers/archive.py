@@ -0,0 +1,116 @@
+"""Compact binary archive of a MoleculeEnsemble
+
+The archive starts with a header of 64 bytes followed by the raw arrays
+of the ensemble, every array aligned to 64 bytes:
+
+=========== ========================== =====================
+section     dtype                      shape
+=========== ========================== =====================
+offsets     little endian int64        frames + 1
+energies    little endian float64      frames
+coordinates little endian float64      atoms, 3
+numbers     uint8                      atoms
+labels      bytes of label_width       frames
+=========== ========================== =====================
+
+The arrays are memory mapped when the archive is read, so opening even a
+very large archive is immediate and only the touched pages are loaded.
+"""
+
+# Standard Library
+import struct
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from ..exceptions import InvalidArchive
+from .molden import NUMBER_DTYPE, MoleculeEnsemble
+
+ARCHIVE_SUFFIX = ".tmol"
+ARCHIVE_VERSION = 1
+
+MAGIC = b"TIDYMOL\0"
+_HEADER = struct.Struct("<8sIqqI")
+_ALIGNMENT = 64
+
+
+def _align(position):
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+def _sections(frames, atoms, label_width):
+    """Returns (name, dtype, shape, offset) of every array of the archive"""
+    layout = (
+        ("offsets", np.dtype("<i8"), (frames + 1,)),
+        ("energies", np.dtype("<f8"), (frames,)),
+        ("coordinates", np.dtype("<f8"), (atoms, 3)),
+        ("numbers", np.dtype(NUMBER_DTYPE), (atoms,)),
+        ("labels", np.dtype("S{}".format(label_width)), (frames,)),
+    )
+    position = _ALIGNMENT
+    sections = []
+    for name, dtype, shape in layout:
+        sections.append((name, dtype, shape, position))
+        position = _align(position + dtype.itemsize * int(np.prod(shape)))
+    return sections
+
+
+def is_archive(filename):
+    """Returns True if the file starts with the magic bytes of an archive"""
+    with open(filename, "rb") as infile:
+        return infile.read(len(MAGIC)) == MAGIC
+
+
+def write_archive(filename, ensemble):
+    """Writes the ensemble into an archive
+
+    :param filename: The path of the archive
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    """
+    labels = np.char.encode(ensemble.labels, "utf-8")
+    label_width = max(1, labels.dtype.itemsize)
+    arrays = {
+        "offsets": ensemble.offsets,
+        "energies": ensemble.energies,
+        "coordinates": ensemble.coordinates,
+        "numbers": ensemble.numbers,
+        "labels": labels,
+    }
+    frames, atoms = len(ensemble), len(ensemble.numbers)
+    with open(filename, "wb") as outfile:
+        outfile.write(_HEADER.pack(MAGIC, ARCHIVE_VERSION, frames, atoms, label_width))
+        for name, dtype, shape, offset in _sections(frames, atoms, label_width):
+            outfile.write(b"\0" * (offset - outfile.tell()))
+            outfile.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+
+
+def read_archive(filename):
+    """Memory maps an archive
+
+    The coordinates are mapped copy-on-write: the ensemble can be modified,
+    e.g. mirrored, without changing the archive.
+
+    :param filename: The path of the archive
+    :return: MoleculeEnsemble
+    """
+    with open(filename, "rb") as infile:
+        header = infile.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise InvalidArchive("{} is not a tidymol archive".format(filename))
+    magic, version, frames, atoms, label_width = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise InvalidArchive("{} is not a tidymol archive".format(filename))
+    if version != ARCHIVE_VERSION:
+        raise InvalidArchive("Unsupported archive version {} of {}".format(version, filename))
+    arrays = {}
+    for name, dtype, shape, offset in _sections(frames, atoms, label_width):
+        if int(np.prod(shape)):
+            arrays[name] = np.memmap(filename, dtype=dtype, mode="c", offset=offset, shape=shape)
+        else:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+    return MoleculeEnsemble(
+        np.char.decode(arrays["labels"], "utf-8"), arrays["energies"],
+        arrays["numbers"], arrays["coordinates"], arrays["offsets"],
+    )
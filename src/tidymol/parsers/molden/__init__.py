@@ -2,127 +2,117 @@
 
 # Standard Library
 import logging
+from array import array
+from itertools import chain
 
 # Third Party Libraries
 import numpy as np
-import ply.lex as lex
-import ply.yacc as yacc
-from molmod.periodic import periodic
 
 # Local imports
+from ...constants import NUMBERS, SYMBOLS, atomic_number
+from ...profiling import stage
+from .reader import read_frames
 
 LOG = logging.getLogger(__name__)
 
-tokens = [ 'INT', 'FLOAT', 'EOL', 'SEP', 'LABEL',
-           'SYMBOL']
-
-t_LABEL = r'[a-zA-Z_][\w\._]+'
-t_EOL = r'(\n|\r\n|\r)'
-t_SEP = r'(\ +|\t+)'
-
-def t_SYMBOL(t):
-    r'(X|H|He|Li|Be|B|C|N|O|F|Ne|Na|Mg|Al|Si|P|S|Cl|Ar|K|Ca|Sc|Ti|V|Cr|Mn|Fe|Co|Ni|Cu|Zn|Ga|Ge|As|Se|Br|Kr|Rb|Sr|Y|Zr|Nb|Mo|Tc|Ru|Rh|Pd|Ag|Cd|In|Sn|Sb|Te|I|Xe|Cs|Ba|La|Ce|Pr|Nd|Pm|Sm|Eu|Gd|Tb|Dy|Ho|Er|Tm|Yb|Lu|Hf|Ta|W|Re|Os|Ir|Pt|Au|Hg|Tl|Pb|Bi|Po|At|Rn|Fr|Ra|Ac|Th|Pa|U|Np|Pu|Am|Cm|Bk|Cf|Es|Fm|Md|No|Lr)(\ |\t)'
-    t.value = t.value[:-1]
-    return t
-
-def t_INT(t):
-    r'(?m)^\d+\ *$'
-    t.value = np.int(t.value)
-    return t
-
-def t_FLOAT(t):
-    r'\-?\d+\.\d+'
-    t.value = np.float(t.value)
-    return t
-
-def t_error(t):
-    raise TypeError("Unknown text '%s'" % (t.value,))
-
-LEXER = lex.lex()
-
-def p_molden_file(p):
-    '''molden_file : molecul
-                   | molden_file molecul
-                   | molden_file EOL
-    '''
-    if len(p) > 2:
-        if p[2] == "\n":
-            p[0] = p[1]
-        else:
-            p[0] = p[1] + [p[2]]
-    else:
-        p[0] = [p[1]]
-
-def p_molecul(p):
-    '''molecul : INT EOL FLOAT SEP LABEL EOL atoms EOL
-               | INT EOL LABEL EOL atoms EOL
-               | INT EOL atoms EOL'''
-    if len(p) == 9:
-        if not p[1] == len(p[7]):
-            LOG.warning("Mismatch of the number_of_atoms in Molecule %s", p[5])
-            LOG.warning("Parsed value: %s", p[1])
-            LOG.warning("Real value of atoms: %s", len(p[7]))
-            LOG.warning("The value will be automatically corrected")
-        p[0] = Molecule(p[5], p[3], p[7])
-    elif len(p) == 7:
-        if not p[1] == len(p[5]):
-            LOG.warning("Mismatch of the number_of_atoms in Molecule %s", p[3])
-            LOG.warning("Parsed value: %s", p[1])
-            LOG.warning("Real value of atoms: %s", len(p[5]))
-            LOG.warning("The value will be automatically corrected")
-        p[0] = Molecule(p[3], 0, p[5])
-    else:
-        if not p[1] == len(p[3]):
-            LOG.warning("Mismatch of the number_of_atoms in Molecule")
-            LOG.warning("Parsed value: %s", p[1])
-            LOG.warning("Real value of atoms: %s", len(p[3]))
-            LOG.warning("The value will be automatically corrected")
-        p[0] = Molecule("", 0, p[3])
-
-def p_atom(p):
-    '''atom : SYMBOL SEP FLOAT SEP FLOAT SEP FLOAT'''
-    p[0] = Atom(p[1], p[3], p[5], p[7])
-
-def p_atoms(p):
-    '''atoms : atom
-             | atoms EOL atom'''
-    if len(p) > 2:
-        p[0] = p[1] + [p[3]]
-    else:
-        p[0] = [p[1]]
-
-def p_error(p):
-    try:
-        LOG.error("{1}: Syntax error on '{0}'".format(p.value, LEXER.lineno))
-    except AttributeError:
-        LOG.error("{0}: Syntax error on line".format(LEXER.lineno))
-
-yacc.yacc()
+
+NUMBER_DTYPE = np.uint8
+
+# The format of a frame, see also writer.py
+HEADER = "%d\n%-12.9f     %s\n"
+ATOM = "%-2s     %12.9f     %12.9f     %12.9f\n"
+
+_SYMBOLS = np.array(SYMBOLS)
+
+# The mirror planes through the origin perpendicular to an axis
+PLANES = {"x": 0, "y": 1, "z": 2}
+
+# The number of coordinates reflected at once on an arbitrary plane
+REFLECT_BLOCK_SIZE = 1 << 16
+
+
+def symbol_mask(numbers, symbols):
+    """Returns a boolean mask of the atoms which are one of the symbols
+
+    :param numbers: The atomic numbers of the atoms, e.g. of a whole ensemble
+    :param symbols: A symbol or a list of symbols, unknown symbols match no atom
+    :return: numpy.ndarray of bools
+    """
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    selected = [NUMBERS[symbol] for symbol in symbols if symbol in NUMBERS]
+    if len(selected) == 1:
+        return numbers == selected[0]
+    return np.isin(numbers, selected)
+
+
+def plane_normal(plane):
+    """Returns the unit normal of a mirror plane through the origin
+
+    :param plane: "x", "y" or "z" for the plane perpendicular to this axis,
+                  or the normal vector of the plane
+    :return: numpy.ndarray of shape (3,)
+    """
+    if isinstance(plane, str):
+        if plane not in PLANES:
+            raise ValueError("Unknown mirror plane '{}'".format(plane))
+        normal = np.zeros(3)
+        normal[PLANES[plane]] = 1.0
+        return normal
+    normal = np.asarray(plane, dtype=np.float64).reshape(-1)
+    length = np.linalg.norm(normal) if normal.shape == (3,) else 0.0
+    if not length:
+        raise ValueError("The normal of a mirror plane needs three components, not all zero")
+    return normal / length
+
+
+def reflect(coordinates, plane="x"):
+    """Reflects (N,3) coordinates in place on a plane through the origin
+
+    :param coordinates: The coordinates, e.g. the block of an ensemble
+    :param plane: See plane_normal
+    """
+    if isinstance(plane, str) and plane in PLANES:
+        coordinates[:, PLANES[plane]] *= -1
+        return
+    normal = plane_normal(plane)
+    for start in range(0, len(coordinates), REFLECT_BLOCK_SIZE):
+        block = coordinates[start:start + REFLECT_BLOCK_SIZE]
+        block -= np.multiply.outer(2 * (block @ normal), normal)
 
 
 class Molecule(object):
+    """A molecule backed by a (N,3) coordinate array and an array of atomic numbers"""
 
-    def __init__(self, label, energy, atoms):
+    def __init__(self, label, energy, numbers, coordinates):
         self._label = label
         self._energy = energy
-        self._atoms = atoms
+        self._numbers = np.asarray(numbers, dtype=NUMBER_DTYPE)
+        self._coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
 
+    @classmethod
+    def from_atoms(cls, label, energy, atoms):
+        return cls(
+            label, energy,
+            [atom.number for atom in atoms],
+            [atom.coordinates for atom in atoms],
+        )
 
     @property
     def number_of_atoms(self):
-        return len(self._atoms)
+        return len(self._numbers)
 
     @property
     def numbers(self):
-        return [atom.number for atom in self._atoms]
+        return self._numbers
 
     @property
     def symbols(self):
-        return [atom.symbol for atom in self._atoms]
+        return _SYMBOLS[self._numbers].tolist()
 
     @property
     def coordinates(self):
-        return np.array([ atom.coordinates for atom in self._atoms])
+        return self._coordinates
 
     @property
     def label(self):
@@ -138,93 +128,367 @@ class Molecule(object):
 
     @energy.setter
     def energy(self, energy):
-        self._energy = np.float(energy)
+        self._energy = float(energy)
 
     @property
     def atoms(self):
-        return self._atoms
+        return [Atom.view(self._numbers, self._coordinates, index)
+                for index in range(len(self._numbers))]
 
     @atoms.setter
     def atoms(self, atoms):
         if len(atoms) < 2:
             raise ValueError("A molecule needs to consist at least of two atoms.")
-        self.number_of_atoms = len(atoms)
-        self._atoms = atoms
+        self._numbers = np.array([atom.number for atom in atoms], dtype=NUMBER_DTYPE)
+        self._coordinates = np.array([atom.coordinates for atom in atoms], dtype=np.float64)
 
     def get_atoms_by_symbol(self, symbol):
-        return [ atom for atom in self._atoms if atom.symbol == symbol ]
+        return [Atom.view(self._numbers, self._coordinates, index)
+                for index in self.get_indexes_by_symbol(symbol).tolist()]
 
     def get_indexes_by_symbol(self, symbol):
-        return [ self._atoms.index(atom) for atom in self._atoms if atom.symbol == symbol ]
+        return np.flatnonzero(symbol_mask(self._numbers, symbol))
 
-    def mirror(self, compare=None):
+    def mirror(self, plane="x"):
         self.label = "ent_{}".format(self.label)
-        for atom in self.atoms:
-            atom.x *=  -1
+        reflect(self._coordinates, plane)
 
     def __str__(self):
-        output = "{}\n".format(self.number_of_atoms)
-        output += "{0:<12.9f}     {1}\n".format(
-                self.energy, self.label)
-        for atom in self.atoms:
-            output += "{}\n".format(str(atom))
-        return output
+        atoms = np.empty((self.number_of_atoms, 4), dtype=object)
+        atoms[:, 0] = self.symbols
+        atoms[:, 1:] = np.around(self._coordinates, 9).tolist()
+        template = HEADER + ATOM * self.number_of_atoms
+        return template % (
+            (self.number_of_atoms, self.energy, self.label) + tuple(atoms.ravel().tolist())
+        )
 
 
 class Atom(object):
+    """A single atom, either standalone or a view on a row of a molecule"""
+
+    __slots__ = ("_numbers", "_coordinates", "_index")
 
     def __init__(self, symbol, x, y, z):
-        self._symbol = symbol
-        self._x = x
-        self._y = y
-        self._z = z
+        self._numbers = np.array([atomic_number(symbol)], dtype=NUMBER_DTYPE)
+        self._coordinates = np.array([[x, y, z]], dtype=np.float64)
+        self._index = 0
+
+    @classmethod
+    def view(cls, numbers, coordinates, index):
+        atom = cls.__new__(cls)
+        atom._numbers = numbers
+        atom._coordinates = coordinates
+        atom._index = index
+        return atom
 
     @property
     def symbol(self):
-        return self._symbol
+        return SYMBOLS[self._numbers[self._index]]
 
     @symbol.setter
     def symbol(self, symbol):
-        self._symbol = symbol
+        self._numbers[self._index] = atomic_number(symbol)
 
     @property
     def number(self):
-        return periodic.atoms_by_symbol[self._symbol.lower()].number
+        return int(self._numbers[self._index])
 
     @property
     def x(self):
-        return self._x
+        return self._coordinates[self._index, 0]
 
     @x.setter
     def x(self, x):
-        self._x = x
+        self._coordinates[self._index, 0] = x
 
     @property
     def y(self):
-        return self._y
+        return self._coordinates[self._index, 1]
 
     @y.setter
     def y(self, y):
-        self._y = y
+        self._coordinates[self._index, 1] = y
 
     @property
     def z(self):
-        return self._z
+        return self._coordinates[self._index, 2]
 
     @z.setter
     def z(self, z):
-        self._z = z
+        self._coordinates[self._index, 2] = z
 
     @property
     def coordinates(self):
-        return np.array([self._x, self._y, self._z], np.float)
+        return self._coordinates[self._index]
 
     def __str__(self):
         seperator = " "*5
+        x, y, z = np.around(self.coordinates, 9)
         return "{0:<2}{sep}{1:>12.9f}{sep}{2:>12.9f}{sep}{3:>12.9f}".format(
-                self._symbol, np.around(self._x, 9), np.around(self._y, 9),
-                np.around(self._z, 9), sep=seperator)
+                self.symbol, x, y, z, sep=seperator)
+
+
+class MoleculeEnsemble(object):
+    """All molecules of a file stored in one contiguous block
+
+    The coordinates of every frame are stored in one (total_atoms,3) array
+    and ``offsets`` holds the index of the first atom of every frame (plus
+    the total number of atoms as last element). Indexing with an integer
+    returns a Molecule sharing the arrays of the ensemble, indexing with a
+    slice, a boolean mask or an index array returns a new ensemble.
+    """
+
+    def __init__(self, labels, energies, numbers, coordinates, offsets):
+        self._labels = np.asarray(labels, dtype=str)
+        self._energies = np.asarray(energies, dtype=np.float64)
+        self._numbers = np.asarray(numbers, dtype=NUMBER_DTYPE)
+        self._coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Builds an ensemble from the frames of :func:`reader.read_frames`"""
+        labels, energies, counts = [], [], []
+        numbers, coordinates = array("B"), array("d")
+        for label, energy, symbols, frame_coordinates in frames:
+            labels.append(label)
+            energies.append(energy)
+            counts.append(len(symbols))
+            numbers.extend(map(NUMBERS.__getitem__, symbols))
+            coordinates.extend(chain.from_iterable(frame_coordinates))
+        return cls(labels, energies, numbers, coordinates, _offsets(counts))
+
+    @classmethod
+    def from_molecules(cls, molecules):
+        molecules = list(molecules)
+        if not molecules:
+            return cls([], [], [], [], [0])
+        return cls(
+            [molecule.label for molecule in molecules],
+            [molecule.energy for molecule in molecules],
+            np.concatenate([molecule.numbers for molecule in molecules]),
+            np.concatenate([molecule.coordinates for molecule in molecules]),
+            _offsets([molecule.number_of_atoms for molecule in molecules]),
+        )
+
+    @classmethod
+    def concatenate(cls, ensembles):
+        ensembles = list(ensembles)
+        counts = np.concatenate([ensemble.numbers_of_atoms for ensemble in ensembles])
+        return cls(
+            np.concatenate([ensemble.labels for ensemble in ensembles]),
+            np.concatenate([ensemble.energies for ensemble in ensembles]),
+            np.concatenate([ensemble.numbers for ensemble in ensembles]),
+            np.concatenate([ensemble.coordinates for ensemble in ensembles]),
+            _offsets(counts),
+        )
 
+    @property
+    def labels(self):
+        return self._labels
+
+    @labels.setter
+    def labels(self, labels):
+        self._labels = np.asarray(labels, dtype=str)
+
+    @property
+    def energies(self):
+        return self._energies
+
+    @property
+    def numbers(self):
+        return self._numbers
+
+    @property
+    def coordinates(self):
+        return self._coordinates
+
+    @property
+    def offsets(self):
+        return self._offsets
 
-def parse(data):
-    return yacc.parse(data)
+    @property
+    def numbers_of_atoms(self):
+        return np.diff(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._molecule(index)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Molecule index out of range")
+            return self._molecule(key)
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            stop = max(start, stop)
+            first, last = self._offsets[start], self._offsets[stop]
+            return MoleculeEnsemble(
+                self._labels[start:stop], self._energies[start:stop],
+                self._numbers[first:last], self._coordinates[first:last],
+                self._offsets[start:stop + 1] - first,
+            )
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        key = np.asarray(key)
+        if key.dtype == bool:
+            key = np.flatnonzero(key)
+        return self.take(key)
+
+    def _molecule(self, index):
+        first, last = self._offsets[index], self._offsets[index + 1]
+        return Molecule(
+            str(self._labels[index]), float(self._energies[index]),
+            self._numbers[first:last], self._coordinates[first:last],
+        )
+
+    def take(self, indices):
+        """Returns a new ensemble with the frames at the given indices"""
+        indices = np.asarray(indices, dtype=np.intp)
+        starts = self._offsets[:-1][indices]
+        counts = self._offsets[1:][indices] - starts
+        offsets = _offsets(counts)
+        rows = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+        return MoleculeEnsemble(
+            self._labels[indices], self._energies[indices],
+            self._numbers[rows], self._coordinates[rows], offsets,
+        )
+
+    def copy(self):
+        return MoleculeEnsemble(
+            self._labels.copy(), self._energies.copy(), self._numbers.copy(),
+            self._coordinates.copy(), self._offsets.copy(),
+        )
+
+    def get_indexes_by_symbol(self, symbol):
+        """Returns the frame and the atom indices of all atoms of one or more elements
+
+        :param symbol: A symbol or a list of symbols
+        :return: (frames, indexes), numpy.ndarrays with one entry per atom
+        """
+        rows = np.flatnonzero(symbol_mask(self._numbers, symbol))
+        frames = np.searchsorted(self._offsets, rows, side="right") - 1
+        return frames, rows - self._offsets[frames]
+
+    def count_symbol(self, symbol):
+        """Returns the number of atoms of one or more elements in every frame"""
+        counts = np.cumsum(symbol_mask(self._numbers, symbol), dtype=np.int64)
+        counts = np.concatenate([[0], counts])
+        return counts[self._offsets[1:]] - counts[self._offsets[:-1]]
+
+    def groups(self):
+        """Yields the frames with the same sequence of atomic numbers
+
+        :return: Generator of (numbers, frame indices) tuples
+        """
+        groups = {}
+        numbers, offsets = self._numbers, self._offsets
+        for index in range(len(self)):
+            key = numbers[offsets[index]:offsets[index + 1]].tobytes()
+            groups.setdefault(key, []).append(index)
+        for key, frames in groups.items():
+            yield np.frombuffer(key, dtype=numbers.dtype), np.array(frames, dtype=np.int64)
+
+    def argsort(self):
+        """Returns the indices which sort the frames by energy"""
+        return np.argsort(self._energies, kind="stable")
+
+    def sorted(self):
+        return self.take(self.argsort())
+
+    def mirror(self, plane="x"):
+        """Mirrors all frames in place, see reflect"""
+        self._labels = np.char.add("ent_", self._labels)
+        reflect(self._coordinates, plane)
+
+    def mirrored(self, plane="x", compare=False):
+        """Returns a mirrored copy of the ensemble
+
+        :param plane: See reflect
+        :param compare: Every original frame is followed by its mirrored frame
+        :return: MoleculeEnsemble
+        """
+        if not compare:
+            mirrored = self.copy()
+            mirrored.mirror(plane)
+            return mirrored
+        # The frames are written once into the interleaved output, block by
+        # block, so no further copy of the ensemble is made
+        counts = self.numbers_of_atoms
+        atoms = len(self._numbers)
+        mirrored_labels = np.char.add("ent_", self._labels)
+        labels = np.empty(2 * len(self), dtype=mirrored_labels.dtype)
+        labels[0::2] = self._labels
+        labels[1::2] = mirrored_labels
+        numbers = np.empty(2 * atoms, dtype=NUMBER_DTYPE)
+        coordinates = np.empty((2 * atoms, 3), dtype=np.float64)
+        for start in range(0, atoms, REFLECT_BLOCK_SIZE):
+            stop = min(start + REFLECT_BLOCK_SIZE, atoms)
+            rows = np.arange(start, stop)
+            frames = np.searchsorted(self._offsets, rows, side="right") - 1
+            # The original frame f starts at row 2 * offsets[f], its mirror image follows it
+            originals = rows + self._offsets[frames]
+            images = originals + counts[frames]
+            numbers[originals] = numbers[images] = self._numbers[start:stop]
+            block = self._coordinates[start:stop].copy()
+            coordinates[originals] = block
+            reflect(block, plane)
+            coordinates[images] = block
+        return MoleculeEnsemble(
+            labels, np.repeat(self._energies, 2), numbers, coordinates, _offsets(np.repeat(counts, 2))
+        )
+
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def iter_molecules(lines):
+    """Yields the molecules of a molden file one at a time
+
+    :param lines: The lines of the molden file, e.g. an open file object
+    :type lines: iterable of str
+    :return: Generator of molecules
+    """
+    for label, energy, symbols, coordinates in read_frames(lines):
+        yield Molecule(label, energy, list(map(NUMBERS.__getitem__, symbols)), coordinates)
+
+
+def read_ensemble(lines):
+    """Reads all molecules of a molden file into one ensemble
+
+    :param lines: The lines of the molden file, e.g. an open file object
+    :type lines: iterable of str
+    :return: MoleculeEnsemble
+    """
+    return MoleculeEnsemble.from_frames(read_frames(lines))
+
+
+def parse(data, strict=False):
+    """Parses the content of a molden file
+
+    :param data: The content of the molden file
+    :type data: str
+    :param strict: Validates the file with the PLY grammar instead of
+                   using the streaming reader
+    :type strict: bool
+    :return: MoleculeEnsemble
+    """
+    with stage("parse") as timer:
+        if strict:
+            # Local imports
+            from .grammar import parse as parse_strict
+
+            molecules = MoleculeEnsemble.from_molecules(parse_strict(data) or [])
+        else:
+            molecules = read_ensemble(data.splitlines())
+        timer.count(len(molecules), len(molecules.numbers))
+    return molecules
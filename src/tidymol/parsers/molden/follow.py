@@ -0,0 +1,76 @@
+"""Following a molden file which is still being written
+
+Geometry optimisations append a frame to their molden file after every
+step. :func:`follow_molecules` keeps the file open, parses every frame as
+soon as it is complete and waits for the rest of a partially written
+frame. While nothing is appended it only sleeps and checks the size of
+the file.
+"""
+
+# Standard Library
+import logging
+import os
+import time
+
+# Local imports
+from . import iter_molecules
+from .reader import complete_frames
+
+LOG = logging.getLogger(__name__)
+
+# The number of bytes read at once
+CHUNK_SIZE = 1 << 20
+
+
+def follow_batches(filename, interval=1.0, timeout=None, chunk_size=CHUNK_SIZE):
+    """Yields the new molecules of a molden file whenever frames are completed
+
+    Every batch holds at least one molecule.
+
+    :param filename: The path of the molden file
+    :param interval: The seconds between two checks for new frames
+    :param timeout: Stops after this many seconds without a new frame, None follows forever
+    :param chunk_size: The number of bytes read at once
+    :return: Generator of lists of molecules
+    """
+    with open(filename, "rb") as infile:
+        pending = b""
+        last_frame = time.monotonic()
+        while True:
+            data = infile.read(chunk_size)
+            if data:
+                pending += data
+                # Only complete lines are parsed, a line may end in the next chunk
+                lines = pending[:pending.rfind(b"\n") + 1].decode().splitlines(keepends=True)
+                end = complete_frames(lines)
+                if end:
+                    text = "".join(lines[:end])
+                    pending = pending[len(text.encode()):]
+                    # Blank lines and lines outside of frames complete no molecule
+                    molecules = list(iter_molecules(text.splitlines()))
+                    if molecules:
+                        last_frame = time.monotonic()
+                        yield molecules
+                continue
+            if os.stat(filename).st_size < infile.tell():
+                LOG.warning("%s was truncated, reading it from the start", filename)
+                infile.seek(0)
+                pending = b""
+                continue
+            if timeout is not None and time.monotonic() - last_frame >= timeout:
+                break
+            time.sleep(interval)
+    # The writer stopped, the frame at the end is as complete as it gets
+    molecules = list(iter_molecules(pending.decode(errors="replace").splitlines()))
+    if molecules:
+        yield molecules
+
+
+def follow_molecules(filename, interval=1.0, timeout=None):
+    """Yields the molecules of a molden file, waiting for new frames at its end
+
+    See follow_batches for the parameters.
+    """
+    for molecules in follow_batches(filename, interval, timeout):
+        for molecule in molecules:
+            yield molecule
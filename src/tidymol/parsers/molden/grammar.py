@@ -0,0 +1,149 @@
+"""PLY grammar of the molden format
+
+The grammar is only used by the strict mode of :func:`parse`. The parse
+tables are generated once and cached as a pickle file in the user cache
+directory, later runs load them in optimize mode.
+"""
+
+# Standard Library
+import hashlib
+import logging
+import os
+import sys
+
+# Third Party Libraries
+import ply.lex as lex
+import ply.yacc as yacc
+
+# Local imports
+from ... import __version__
+from ...cache import user_cache_dir
+from ...profiling import stage
+from . import Atom, Molecule
+
+LOG = logging.getLogger(__name__)
+
+PARSER = None
+
+tokens = [ 'INT', 'FLOAT', 'EOL', 'SEP', 'LABEL',
+           'SYMBOL']
+
+t_LABEL = r'[a-zA-Z_][\w\._]+'
+t_EOL = r'(\n|\r\n|\r)'
+t_SEP = r'(\ +|\t+)'
+
+def t_SYMBOL(t):
+    r'(X|H|He|Li|Be|B|C|N|O|F|Ne|Na|Mg|Al|Si|P|S|Cl|Ar|K|Ca|Sc|Ti|V|Cr|Mn|Fe|Co|Ni|Cu|Zn|Ga|Ge|As|Se|Br|Kr|Rb|Sr|Y|Zr|Nb|Mo|Tc|Ru|Rh|Pd|Ag|Cd|In|Sn|Sb|Te|I|Xe|Cs|Ba|La|Ce|Pr|Nd|Pm|Sm|Eu|Gd|Tb|Dy|Ho|Er|Tm|Yb|Lu|Hf|Ta|W|Re|Os|Ir|Pt|Au|Hg|Tl|Pb|Bi|Po|At|Rn|Fr|Ra|Ac|Th|Pa|U|Np|Pu|Am|Cm|Bk|Cf|Es|Fm|Md|No|Lr)(\ |\t)'
+    t.value = t.value[:-1]
+    return t
+
+def t_INT(t):
+    r'(?m:^\d+\ *$)'
+    t.value = int(t.value)
+    return t
+
+def t_FLOAT(t):
+    r'\-?\d+\.\d+'
+    t.value = float(t.value)
+    return t
+
+def t_error(t):
+    raise TypeError("Unknown text '%s'" % (t.value,))
+
+LEXER = None
+
+def p_molden_file(p):
+    '''molden_file : molecul
+                   | molden_file molecul
+                   | molden_file EOL
+    '''
+    if len(p) > 2:
+        if p[2] == "\n":
+            p[0] = p[1]
+        else:
+            p[0] = p[1] + [p[2]]
+    else:
+        p[0] = [p[1]]
+
+def p_molecul(p):
+    '''molecul : INT EOL FLOAT SEP LABEL EOL atoms EOL
+               | INT EOL LABEL EOL atoms EOL
+               | INT EOL atoms EOL'''
+    if len(p) == 9:
+        if not p[1] == len(p[7]):
+            LOG.warning("Mismatch of the number_of_atoms in Molecule %s", p[5])
+            LOG.warning("Parsed value: %s", p[1])
+            LOG.warning("Real value of atoms: %s", len(p[7]))
+            LOG.warning("The value will be automatically corrected")
+        p[0] = Molecule.from_atoms(p[5], p[3], p[7])
+    elif len(p) == 7:
+        if not p[1] == len(p[5]):
+            LOG.warning("Mismatch of the number_of_atoms in Molecule %s", p[3])
+            LOG.warning("Parsed value: %s", p[1])
+            LOG.warning("Real value of atoms: %s", len(p[5]))
+            LOG.warning("The value will be automatically corrected")
+        p[0] = Molecule.from_atoms(p[3], 0, p[5])
+    else:
+        if not p[1] == len(p[3]):
+            LOG.warning("Mismatch of the number_of_atoms in Molecule")
+            LOG.warning("Parsed value: %s", p[1])
+            LOG.warning("Real value of atoms: %s", len(p[3]))
+            LOG.warning("The value will be automatically corrected")
+        p[0] = Molecule.from_atoms("", 0, p[3])
+
+def p_atom(p):
+    '''atom : SYMBOL SEP FLOAT SEP FLOAT SEP FLOAT'''
+    p[0] = Atom(p[1], p[3], p[5], p[7])
+
+def p_atoms(p):
+    '''atoms : atom
+             | atoms EOL atom'''
+    if len(p) > 2:
+        p[0] = p[1] + [p[3]]
+    else:
+        p[0] = [p[1]]
+
+def p_error(p):
+    try:
+        LOG.error("{1}: Syntax error on '{0}'".format(p.value, LEXER.lineno))
+    except AttributeError:
+        LOG.error("{0}: Syntax error on line".format(LEXER.lineno))
+
+
+def _table_path():
+    """Returns the path of the cached parse tables, unique for this version of the grammar"""
+    with open(__file__, "rb") as infile:
+        digest = hashlib.sha1(infile.read()).hexdigest()[:12]
+    return user_cache_dir("molden-parsetab-{}-{}.pickle".format(__version__, digest))
+
+
+def get_parser():
+    """Builds the lexer and the parser on first use"""
+    global LEXER, PARSER
+    if PARSER is None:
+        module = sys.modules[__name__]
+        LEXER = lex.lex(module=module)
+        picklefile = _table_path()
+        try:
+            os.makedirs(os.path.dirname(picklefile), exist_ok=True)
+            write_tables = True
+        except OSError:
+            write_tables = False
+        PARSER = yacc.yacc(
+            module=module, debug=False, optimize=True,
+            picklefile=picklefile, write_tables=write_tables,
+        )
+    return PARSER
+
+
+def parse(data):
+    """Parses the content of a molden file with the PLY grammar
+
+    :return: List of molecules or None
+    """
+    with stage("grammar tables"):
+        parser = get_parser()
+    LEXER.lineno = 1
+    # The lexer is called by the parser, its time is part of yacc.parse
+    with stage("yacc.parse"):
+        return parser.parse(data, lexer=LEXER)
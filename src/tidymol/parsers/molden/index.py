@@ -0,0 +1,294 @@
+"""Random access to the frames of a molden file
+
+A single scan over the file collects the byte offset, the length, the
+number of atoms, the energy and the label of every frame. The result is
+stored in a sidecar file next to the molden file (``<filename>.tidx``) and
+reused as long as size and modification time of the molden file match.
+The frames themselves are read from a memory map of the molden file, so a
+single frame can be fetched without parsing anything else.
+"""
+
+# Standard Library
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from collections import defaultdict
+
+# Third Party Libraries
+import numpy as np
+from loguru import logger
+
+# Local imports
+from . import iter_molecules, read_ensemble
+from .reader import is_count_line, parse_atom, parse_comment
+
+INDEX_SUFFIX = ".tidx"
+INDEX_VERSION = 1
+
+_MAGIC = b"TIDYIDX\0"
+_HEADER = struct.Struct("<8sIqqqI")
+_HEADER_SIZE = 64
+
+# The size of the digests of the frames
+HASH_SIZE = 16
+
+# The number of records built in memory before they are written to the index file
+BLOCK_SIZE = 1 << 14
+
+
+def _record_dtype(label_width):
+    return np.dtype([
+        ("offset", "<i8"),
+        ("length", "<i8"),
+        ("number_of_atoms", "<i4"),
+        ("energy", "<f8"),
+        ("label", "S{}".format(max(1, label_width))),
+    ])
+
+
+def scan_frames(stream):
+    """Yields ``(offset, length, number_of_atoms, energy, label)`` for every frame
+
+    The framing uses the helpers of :mod:`reader` like read_frames, so
+    the byte range of a frame parses to exactly one molecule.
+
+    :param stream: The molden file opened in binary mode
+    """
+    offset = 0
+    line = stream.readline()
+    while line:
+        fields = line.split()
+        if not is_count_line(fields):
+            offset += len(line)
+            line = stream.readline()
+            continue
+        start = offset
+        number_of_atoms = 0
+        energy, label = 0.0, b""
+
+        offset += len(line)
+        line = stream.readline()
+        if line:
+            if parse_atom(line.split()) is not None:
+                number_of_atoms += 1
+            else:
+                energy, label = parse_comment(line)
+            offset += len(line)
+            line = stream.readline()
+
+        while line and parse_atom(line.split()) is not None:
+            number_of_atoms += 1
+            offset += len(line)
+            line = stream.readline()
+
+        yield start, offset - start, number_of_atoms, energy, label
+
+
+def index_path(filename):
+    return "{}{}".format(filename, INDEX_SUFFIX)
+
+
+def build_index(filename, outfile, block_size=BLOCK_SIZE):
+    """Scans the molden file and writes its index records behind the header of outfile
+
+    The records are collected in a block of block_size records and written
+    whenever it is full, so the memory does not grow with the number of
+    frames. The label width is the longest label seen so far, a longer
+    label widens the records already written in place.
+
+    :param outfile: The index file opened in ``w+b`` mode, the header is not written
+    :return: The number of records and the label width
+    """
+    count = filled = 0
+    label_width = 1
+    block = np.empty(block_size, dtype=_record_dtype(label_width))
+    outfile.seek(_HEADER_SIZE)
+    with open(filename, "rb") as stream:
+        for frame in scan_frames(stream):
+            if len(frame[4]) > label_width:
+                outfile.write(block[:filled].tobytes())
+                count, filled = count + filled, 0
+                width = max(len(frame[4]), 2 * label_width)
+                _widen(outfile, count, label_width, width, block_size)
+                label_width = width
+                block = np.empty(block_size, dtype=_record_dtype(label_width))
+            block[filled] = frame
+            filled += 1
+            if filled == block_size:
+                outfile.write(block.tobytes())
+                count, filled = count + filled, 0
+    outfile.write(block[:filled].tobytes())
+    return count + filled, label_width
+
+
+def _widen(outfile, count, old_width, new_width, block_size):
+    """Rewrites the first count records of outfile with a wider label
+
+    The records only move towards the end of the file, so rewriting the
+    last block first never overwrites a record which is still to be read.
+    """
+    old_dtype, new_dtype = _record_dtype(old_width), _record_dtype(new_width)
+    for start in reversed(range(0, count, block_size)):
+        size = min(block_size, count - start)
+        outfile.seek(_HEADER_SIZE + start * old_dtype.itemsize)
+        records = np.frombuffer(outfile.read(size * old_dtype.itemsize), dtype=old_dtype)
+        outfile.seek(_HEADER_SIZE + start * new_dtype.itemsize)
+        outfile.write(records.astype(new_dtype).tobytes())
+    outfile.seek(_HEADER_SIZE + count * new_dtype.itemsize)
+
+
+def _header(stat, count, label_width):
+    return _HEADER.pack(
+        _MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, count, label_width,
+    ).ljust(_HEADER_SIZE, b"\0")
+
+
+def _map_records(outfile, count, label_width):
+    dtype = _record_dtype(label_width)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(outfile, dtype=dtype, mode="r", offset=_HEADER_SIZE, shape=(count,))
+
+
+def write_index(filename, stat):
+    """Builds the index of a molden file in its sidecar file"""
+    path = index_path(filename)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, "w+b") as outfile:
+            count, label_width = build_index(filename, outfile)
+            outfile.seek(0)
+            outfile.write(_header(stat, count, label_width))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_index(filename, stat):
+    """Returns the memory mapped index records or None if the sidecar file is missing or stale"""
+    path = index_path(filename)
+    try:
+        with open(path, "rb") as infile:
+            header = infile.read(_HEADER_SIZE)
+    except OSError:
+        return None
+    if len(header) < _HEADER_SIZE:
+        return None
+    magic, version, size, mtime_ns, count, label_width = _HEADER.unpack_from(header)
+    if (magic != _MAGIC or version != INDEX_VERSION
+            or size != stat.st_size or mtime_ns != stat.st_mtime_ns):
+        return None
+    return _map_records(path, count, label_width)
+
+
+def load_index(filename):
+    """Returns the index records of a molden file, (re)building the sidecar file if necessary
+
+    If the sidecar file can not be written, the index is built in a
+    temporary file which is removed when the records are released.
+    """
+    stat = os.stat(filename)
+    records = read_index(filename, stat)
+    if records is not None:
+        return records
+    logger.info("Building index of {}", filename)
+    try:
+        write_index(filename, stat)
+    except OSError as error:
+        logger.warning("Could not write the index of {}: {}", filename, error)
+        with tempfile.TemporaryFile() as outfile:
+            count, label_width = build_index(filename, outfile)
+            outfile.flush()
+            return _map_records(outfile, count, label_width)
+    return read_index(filename, stat)
+
+
+class IndexedMoldenFile(object):
+    """Memory mapped molden file with random access to its frames"""
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._records = load_index(filename)
+        self._file = open(filename, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""
+        self._positions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def records(self):
+        return self._records
+
+    @property
+    def offsets(self):
+        return self._records["offset"]
+
+    @property
+    def energies(self):
+        return self._records["energy"]
+
+    @property
+    def numbers_of_atoms(self):
+        return self._records["number_of_atoms"]
+
+    @property
+    def labels(self):
+        return np.char.decode(self._records["label"])
+
+    def frame(self, index):
+        """Returns the raw text of the frame at index"""
+        record = self._records[index]
+        start = int(record["offset"])
+        return self._data[start:start + int(record["length"])].decode()
+
+    def hashes(self):
+        """Returns the digests of the raw bytes of every frame
+
+        :return: numpy.ndarray of bytes with HASH_SIZE bytes per frame
+        """
+        data = self._data
+        digests = [
+            hashlib.blake2b(data[start:start + length], digest_size=HASH_SIZE).digest()
+            for start, length in zip(self.offsets.tolist(), self._records["length"].tolist())
+        ]
+        return np.array(digests, dtype="S{}".format(HASH_SIZE))
+
+    def __getitem__(self, index):
+        return next(iter_molecules(self.frame(index).splitlines()))
+
+    def take(self, indices):
+        """Reads the frames at the given indices into a MoleculeEnsemble"""
+        return read_ensemble(
+            line for index in indices for line in self.frame(index).splitlines()
+        )
+
+    def find(self, label):
+        """Returns the indices of all frames with the given label"""
+        if self._positions is None:
+            self._positions = defaultdict(list)
+            for position, frame_label in enumerate(self.labels):
+                self._positions[frame_label].append(position)
+        return list(self._positions.get(label, []))
@@ -0,0 +1,200 @@
+"""Streaming reader for molden files
+
+The reader walks the input line by line (count line, energy/label line,
+atom lines) and yields one frame at a time, so parsing is linear in the
+size of the file and never needs the whole file in memory.
+
+The strict parser needs the whole content as one string, read_chunks
+reads it in large binary chunks and normalises every chunk at once.
+
+The framing of a molden file is defined by the helpers of this module,
+every reader which splits a file into frames uses them:
+
+* :func:`is_count_line`: a line with a single number starts a frame,
+  :data:`COUNT_LINE` finds these lines in raw bytes
+* :func:`parse_atom`: the atom lines following it belong to the frame
+* :func:`parse_comment`: the line after the count line is the
+  energy/label line, unless it is an atom line
+
+Besides read_frames these are complete_frames, the frame index
+(``index.scan_frames``) and the label rewriting of ``tidymol.relabel``.
+"""
+
+# Standard Library
+import logging
+import re
+
+# Local imports
+from ...constants import SYMBOLS
+
+LOG = logging.getLogger(__name__)
+
+# The symbols as str and as bytes, so the helpers work on both
+_SYMBOLS = frozenset(SYMBOLS) | frozenset(symbol.encode() for symbol in SYMBOLS)
+
+# A count line in raw bytes, see is_count_line
+COUNT_LINE = re.compile(rb"^[ \t]*\d+[ \t]*\r?$", re.MULTILINE)
+
+# The number of bytes read at once by read_chunks
+CHUNK_SIZE = 1 << 20
+
+_TRAILING_SPACES = re.compile(r" +$", re.MULTILINE)
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Yields the content of a binary stream as text in chunks of complete lines
+
+    Newlines are translated to "\\n" and the trailing spaces of every line
+    are removed, as the strict parser expects it.
+
+    :param stream: The molden file opened in binary mode
+    :param chunk_size: The number of bytes read at once
+    :return: Generator of str
+    """
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        data = pending + chunk
+        # Without more data the last line is complete, even without a newline
+        end = data.rfind(b"\n") + 1 if chunk else len(data)
+        pending = data[end:]
+        if end:
+            text = data[:end].decode()
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            yield _TRAILING_SPACES.sub("", text)
+        if not chunk:
+            return
+
+
+def is_count_line(fields):
+    """Returns True if the fields of a line form a count line, which starts a frame"""
+    return len(fields) == 1 and fields[0].isdigit()
+
+
+def parse_atom(fields):
+    """Returns ``(x, y, z)`` if the fields of a line form an atom line, otherwise None
+
+    :param fields: The fields of the line as str or bytes
+    """
+    if len(fields) != 4 or fields[0] not in _SYMBOLS:
+        return None
+    try:
+        return float(fields[1]), float(fields[2]), float(fields[3])
+    except ValueError:
+        return None
+
+
+def parse_comment(line):
+    """Splits the energy/label line of a frame into ``(energy, label)``
+
+    :param line: The line as str or bytes, the label has the same type
+    """
+    empty = line[:0]
+    fields = line.split(None, 1)
+    if not fields:
+        return 0, empty
+    try:
+        energy = float(fields[0])
+    except ValueError:
+        return 0, line.strip()
+    if len(fields) == 1:
+        return energy, empty
+    return energy, fields[1].strip()
+
+
+def _warn_mismatch(label, parsed, real):
+    if label:
+        LOG.warning("Mismatch of the number_of_atoms in Molecule %s", label)
+    else:
+        LOG.warning("Mismatch of the number_of_atoms in Molecule")
+    LOG.warning("Parsed value: %s", parsed)
+    LOG.warning("Real value of atoms: %s", real)
+    LOG.warning("The value will be automatically corrected")
+
+
+def read_frames(lines):
+    """Yields the frames of a molden file one by one
+
+    :param lines: The lines of the molden file, e.g. an open file object
+    :type lines: iterable of str
+    :return: Generator of ``(label, energy, symbols, coordinates)`` tuples,
+             where coordinates is a list of ``(x, y, z)`` tuples
+    """
+    lines = iter(lines)
+    lineno = 1
+    line = next(lines, None)
+    while line is not None:
+        fields = line.split()
+        if not fields:
+            line = next(lines, None)
+            lineno += 1
+            continue
+        if not is_count_line(fields):
+            LOG.error("{1}: Syntax error on '{0}'".format(line.rstrip(), lineno))
+            line = next(lines, None)
+            lineno += 1
+            continue
+        number_of_atoms = int(fields[0])
+        label, energy, symbols, coordinates = "", 0, [], []
+
+        line = next(lines, None)
+        lineno += 1
+        if line is not None:
+            fields = line.split()
+            atom = parse_atom(fields)
+            if atom is None:
+                energy, label = parse_comment(line)
+            else:
+                symbols.append(fields[0])
+                coordinates.append(atom)
+            line = next(lines, None)
+            lineno += 1
+
+        while line is not None:
+            fields = line.split()
+            atom = parse_atom(fields)
+            if atom is None:
+                break
+            symbols.append(fields[0])
+            coordinates.append(atom)
+            line = next(lines, None)
+            lineno += 1
+
+        if number_of_atoms != len(symbols):
+            _warn_mismatch(label, number_of_atoms, len(symbols))
+        yield label, energy, symbols, coordinates
+
+
+def complete_frames(lines):
+    """Returns the number of leading lines which form complete frames
+
+    The last frame is complete if it has as many atom lines as its count
+    line announces. The remaining lines may be a frame which is still being
+    written, they are parsed again once more lines are available.
+
+    :param lines: Complete lines, i.e. without a partially written last line
+    :type lines: list of str
+    """
+    end = position = 0
+    while position < len(lines):
+        fields = lines[position].split()
+        if not is_count_line(fields):
+            # Skipped by read_frames as well
+            position += 1
+            end = position
+            continue
+        number_of_atoms = int(fields[0])
+        position += 1
+        if position == len(lines):
+            break
+        if parse_atom(lines[position].split()) is None:
+            position += 1
+        atoms = 0
+        while position < len(lines) and parse_atom(lines[position].split()) is not None:
+            atoms += 1
+            position += 1
+        if position == len(lines) and atoms < number_of_atoms:
+            break
+        end = position
+    return end
@@ -0,0 +1,86 @@
+"""Buffered writer for molden files
+
+The frames are formatted in blocks: one format template is built for the
+whole block and filled with a single ``%`` operation from a flat argument
+array, so there is no per atom string handling in Python. The output is
+identical to ``print(molecule)`` for every molecule.
+"""
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from ...constants import SYMBOLS
+from ...profiling import stage
+from . import ATOM, HEADER, MoleculeEnsemble
+
+# The number of atoms formatted at once
+BLOCK_SIZE = 1 << 16
+
+# print(molecule) used to add an empty line after every frame
+FOOTER = "\n"
+
+_SYMBOLS = np.array(SYMBOLS, dtype=object)
+
+
+def format_ensemble(ensemble):
+    """Returns the text of all frames of the ensemble"""
+    counts = ensemble.numbers_of_atoms
+    template = "".join([HEADER + ATOM * int(count) + FOOTER for count in counts])
+
+    # Every frame takes three header arguments followed by four per atom
+    sizes = 3 + 4 * counts
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(sizes[:-1], out=starts[1:])
+    arguments = np.empty(int(sizes.sum()), dtype=object)
+    headers = np.zeros(len(arguments), dtype=bool)
+    headers[starts] = headers[starts + 1] = headers[starts + 2] = True
+    arguments[starts] = counts.tolist()
+    arguments[starts + 1] = ensemble.energies.tolist()
+    arguments[starts + 2] = ensemble.labels.tolist()
+
+    atoms = np.empty((len(ensemble.numbers), 4), dtype=object)
+    atoms[:, 0] = _SYMBOLS[ensemble.numbers]
+    atoms[:, 1:] = np.around(ensemble.coordinates, 9).tolist()
+    arguments[~headers] = atoms.ravel()
+    return template % tuple(arguments.tolist())
+
+
+def _blocks(molecules):
+    """Splits ensembles or iterables of molecules into ensembles of about BLOCK_SIZE atoms"""
+    if isinstance(molecules, MoleculeEnsemble):
+        offsets = molecules.offsets
+        start = 0
+        while start < len(molecules):
+            stop = int(np.searchsorted(offsets, offsets[start] + BLOCK_SIZE, side="right")) - 1
+            stop = min(max(stop, start + 1), len(molecules))
+            yield molecules[start:stop]
+            start = stop
+        return
+    block, atoms = [], 0
+    for molecule in molecules:
+        block.append(molecule)
+        atoms += molecule.number_of_atoms
+        if atoms >= BLOCK_SIZE:
+            yield MoleculeEnsemble.from_molecules(block)
+            block, atoms = [], 0
+    if block:
+        yield MoleculeEnsemble.from_molecules(block)
+
+
+def write_molden(outfile, molecules):
+    """Writes molecules in the molden format
+
+    :param outfile: A writable text stream
+    :param molecules: A MoleculeEnsemble or an iterable of molecules
+    :return: (frames, atoms), the numbers of written frames and atoms
+    """
+    frames = atoms = 0
+    for block in _blocks(molecules):
+        with stage("format") as timer:
+            text = format_ensemble(block)
+            timer.count(len(block), len(block.numbers))
+        outfile.write(text)
+        frames += len(block)
+        atoms += len(block.numbers)
+    return frames, atoms
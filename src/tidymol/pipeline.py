@@ -0,0 +1,139 @@
+"""Chains modifications of molecules without intermediate files
+
+Every stage takes an iterable of molecules and returns an iterable of
+molecules. The stages are lazy generators, only sort has to see all
+molecules before it yields the first one. A file is therefore parsed once
+and written once, however many stages are chained::
+
+    molecules = Pipeline(iter_file("in.molden"))
+    molecules = molecules.filter(labels).mirror(compare=True).sort()
+    output(molecules)
+"""
+
+# Standard Library
+from itertools import islice
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .join import match_energies
+from .parsers.molden import Molecule, MoleculeEnsemble
+from .replace import replace_atoms
+from .sorting import lowest_energies
+
+# The number of molecules matched at once by their energies
+BATCH_SIZE = 4096
+
+
+def _batches(molecules, size):
+    molecules = iter(molecules)
+    while True:
+        batch = list(islice(molecules, size))
+        if not batch:
+            return
+        yield batch
+
+
+def filter_molecules(molecules, keys, by="label", exclude=False, tolerance=1e-9):
+    """Yields the molecules which match any key
+
+    :param molecules: An iterable of molecules
+    :param keys: The labels or the energies of the filter
+    :param by: "label" or "energy"
+    :param exclude: Yields the molecules which do not match any key instead
+    :param tolerance: The maximum difference of two matching energies
+    :return: Generator of molecules
+    """
+    if by == "label":
+        keys = set(keys)
+        for molecule in molecules:
+            if (molecule.label in keys) != exclude:
+                yield molecule
+        return
+    keys = np.sort(np.asarray(keys, dtype=np.float64))
+    for batch in _batches(molecules, BATCH_SIZE):
+        mask = match_energies([molecule.energy for molecule in batch], keys, tolerance)
+        for molecule, matches in zip(batch, mask.tolist()):
+            if matches != exclude:
+                yield molecule
+
+
+def mirror_molecules(molecules, compare=False, plane="x"):
+    """Yields the mirrored molecules
+
+    :param molecules: An iterable of molecules
+    :param compare: Yields every original molecule before its mirrored molecule
+    :param plane: The mirror plane, see parsers.molden.reflect
+    :return: Generator of molecules
+    """
+    for molecule in molecules:
+        if compare:
+            yield molecule
+        mirrored = Molecule(
+            molecule.label, molecule.energy, molecule.numbers, molecule.coordinates.copy()
+        )
+        mirrored.mirror(plane)
+        yield mirrored
+
+
+def replace_molecules(molecules, rules):
+    """Yields the molecules with the symbols of the selected atoms replaced
+
+    :param molecules: An iterable of molecules
+    :param rules: The rules of replace.replace_atoms
+    :return: Generator of molecules
+    """
+    for batch in _batches(molecules, BATCH_SIZE):
+        for molecule in replace_atoms(MoleculeEnsemble.from_molecules(batch), rules):
+            yield molecule
+
+
+def sort_molecules(molecules, top=None):
+    """Returns the molecules ordered by energy
+
+    Molecules with the same energy keep their order. This stage has to
+    read all molecules first, with top only the lowest ones are kept.
+
+    :param molecules: An iterable of molecules
+    :param top: Keeps only the top molecules with the lowest energies
+    :return: MoleculeEnsemble or list of molecules
+    """
+    if top:
+        return lowest_energies(molecules, top)
+    return MoleculeEnsemble.from_molecules(molecules).sorted()
+
+
+class Pipeline(object):
+    """Lazily chains stages over an iterable of molecules"""
+
+    def __init__(self, molecules):
+        self._molecules = molecules
+
+    def then(self, stage, *args, **kwargs):
+        """Appends a stage
+
+        :param stage: A function which takes an iterable of molecules as the
+                      first argument and returns an iterable of molecules
+        :return: Pipeline
+        """
+        return Pipeline(stage(self._molecules, *args, **kwargs))
+
+    def filter(self, keys, by="label", exclude=False, tolerance=1e-9):
+        return self.then(filter_molecules, keys, by, exclude, tolerance)
+
+    def mirror(self, compare=False, plane="x"):
+        return self.then(mirror_molecules, compare, plane)
+
+    def replace(self, rules):
+        return self.then(replace_molecules, rules)
+
+    def sort(self, top=None):
+        return self.then(sort_molecules, top)
+
+    @property
+    def molecules(self):
+        return self._molecules
+
+    def __iter__(self):
+        return iter(self._molecules)
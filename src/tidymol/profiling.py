@@ -0,0 +1,209 @@
+"""Timing of the stages of a run
+
+The stages are marked with :func:`stage`, which does nothing unless a
+profiler is enabled::
+
+    with stage("read") as timer:
+        molecules = read_ensemble(infile)
+        timer.count(len(molecules), len(molecules.numbers))
+
+Every stage records its wall time, the number of frames and atoms it
+processed and the peak memory of the process when it ended. Stages can be
+nested and entered several times, the times and counts of a name are
+summed. A stage which consumes a lazy generator includes the time of the
+generator, e.g. writing the output of a pipeline includes the parsing.
+"""
+
+# Standard Library
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+_PROFILER = None
+
+
+def peak_memory():
+    """Returns the peak resident memory of the process in bytes, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Stage(object):
+    """The totals of all runs of one stage"""
+
+    def __init__(self, name, depth):
+        self._name = name
+        self._depth = depth
+        self._calls = 0
+        self._seconds = 0.0
+        self._frames = 0
+        self._atoms = 0
+        self._peak_memory = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def depth(self):
+        """The number of enclosing stages when the stage was entered first"""
+        return self._depth
+
+    @property
+    def calls(self):
+        return self._calls
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def frames(self):
+        return self._frames
+
+    @property
+    def atoms(self):
+        return self._atoms
+
+    @property
+    def peak_memory(self):
+        return self._peak_memory
+
+    def count(self, frames=0, atoms=0):
+        """Adds processed frames and atoms"""
+        self._frames += frames
+        self._atoms += atoms
+
+    def as_dict(self):
+        return {
+            "name": self._name,
+            "depth": self._depth,
+            "calls": self._calls,
+            "seconds": self._seconds,
+            "frames": self._frames,
+            "atoms": self._atoms,
+            "frames_per_second": self._frames / self._seconds if self._seconds else None,
+            "atoms_per_second": self._atoms / self._seconds if self._seconds else None,
+            "peak_memory": self._peak_memory,
+        }
+
+    def __str__(self):
+        text = "{}{}: {:.3f} s".format("  " * self._depth, self._name, self._seconds)
+        if self._calls > 1:
+            text += " in {} calls".format(self._calls)
+        if self._frames and self._seconds:
+            text += ", {} frames ({:.0f}/s)".format(self._frames, self._frames / self._seconds)
+        if self._atoms and self._seconds:
+            text += ", {} atoms ({:.0f}/s)".format(self._atoms, self._atoms / self._seconds)
+        if self._peak_memory is not None:
+            text += ", peak memory {:.1f} MiB".format(self._peak_memory / (1 << 20))
+        return text
+
+
+class _Timer(object):
+    """Times one run of a stage"""
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._stage = None
+        self._start = None
+
+    def count(self, frames=0, atoms=0):
+        self._stage.count(frames, atoms)
+
+    def __enter__(self):
+        self._stage = self._profiler.get(self._name)
+        self._profiler._depth += 1
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        stage = self._stage
+        stage._seconds += time.perf_counter() - self._start
+        stage._calls += 1
+        stage._peak_memory = peak_memory()
+        self._profiler._depth -= 1
+
+
+class _NullTimer(object):
+    """Stands in for a timer while profiling is disabled"""
+
+    def count(self, frames=0, atoms=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler(object):
+    """Collects the stages of a run in the order they were entered first"""
+
+    def __init__(self):
+        self._stages = {}
+        self._depth = 0
+        self._start = time.perf_counter()
+
+    @property
+    def stages(self):
+        return list(self._stages.values())
+
+    @property
+    def seconds(self):
+        """The wall time since the profiler was created"""
+        return time.perf_counter() - self._start
+
+    def get(self, name):
+        """Returns the stage of name, created at the current depth if it is new"""
+        if name not in self._stages:
+            self._stages[name] = Stage(name, self._depth)
+        return self._stages[name]
+
+    def stage(self, name):
+        return _Timer(self, name)
+
+    def as_dict(self):
+        return {
+            "seconds": self.seconds,
+            "peak_memory": peak_memory(),
+            "stages": [stage.as_dict() for stage in self._stages.values()],
+        }
+
+
+def enable():
+    """Starts collecting the stages of this process and returns the profiler"""
+    global _PROFILER
+    _PROFILER = Profiler()
+    return _PROFILER
+
+
+def disable():
+    """Stops collecting stages and returns the profiler, or None if it was not enabled"""
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    return profiler
+
+
+def enabled():
+    """Returns True if a profiler collects the stages"""
+    return _PROFILER is not None
+
+
+def stage(name):
+    """Returns a context manager which times the stage name, see the module documentation"""
+    if _PROFILER is None:
+        return _NULL_TIMER
+    return _PROFILER.stage(name)
@@ -0,0 +1,123 @@
+"""Rewriting the labels of a molden file without parsing its atoms
+
+The file is copied chunk by chunk. The count lines of the frames are found
+with ``reader.COUNT_LINE``, only the line after each of them, the energy/label
+line, is decoded and replaced. The atom lines are copied as they are.
+
+The new label line is rendered from a format template with the fields
+
+* ``{index}``: the number of the frame, starting at ``start``
+* ``{energy}``: the energy of the frame as float
+* ``{label}``: the original label
+* ``{0}``, ``{1}``, ... and ``{name}``: the whole match and the groups of
+  the regular expression ``pattern``, which is searched in the original line
+"""
+
+# Standard Library
+import logging
+import re
+
+# Local imports
+from .exceptions import LabelMismatch
+from .parsers.molden.reader import COUNT_LINE, parse_atom, parse_comment
+
+LOG = logging.getLogger(__name__)
+
+# The number of bytes read at once
+CHUNK_SIZE = 1 << 20
+
+
+class Relabeler(object):
+    """Renders the new label line of every frame
+
+    :param template: The format template of the new line
+    :param pattern: A regular expression searched in the original line
+    :param start: The index of the first frame
+    :param require_match: Raises LabelMismatch if pattern does not match,
+                          otherwise the line is kept
+    """
+
+    def __init__(self, template, pattern=None, start=1, require_match=False):
+        self._template = template
+        self._pattern = re.compile(pattern) if pattern else None
+        self._index = start
+        self._require_match = require_match
+        self._mismatches = 0
+
+    @property
+    def mismatches(self):
+        """The number of lines which were kept because pattern did not match"""
+        return self._mismatches
+
+    def __call__(self, line):
+        """Returns the new line for the energy/label line, or None to keep it"""
+        index = self._index
+        self._index += 1
+        groups, named = (), {}
+        if self._pattern is not None:
+            match = self._pattern.search(line)
+            if match is None:
+                if self._require_match:
+                    raise LabelMismatch("The label line of frame {} does not match: {}".format(
+                        index, line.strip()))
+                self._mismatches += 1
+                return None
+            groups, named = (match.group(0),) + match.groups(), match.groupdict()
+        energy, label = parse_comment(line)
+        fields = dict(named, index=index, energy=float(energy), label=label)
+        return self._template.format(*groups, **fields)
+
+
+def relabel_frames(infile, outfile, relabeler, chunk_size=CHUNK_SIZE):
+    """Copies a molden file and rewrites the energy/label line of every frame
+
+    :param infile: The molden file opened in binary mode
+    :param outfile: The output opened in binary mode
+    :param relabeler: A function which returns the new line for an energy/label
+                      line, or None to keep it, e.g. a Relabeler
+    :param chunk_size: The number of bytes read at once
+    :return: The number of frames
+    """
+    frames = 0
+    pending = b""
+    while True:
+        chunk = infile.read(chunk_size)
+        data = pending + chunk
+        # Without more data the last line is complete, even without a newline
+        end = data.rfind(b"\n") + 1 if chunk else len(data)
+        position = skip = 0
+        for match in COUNT_LINE.finditer(data, 0, end):
+            if match.start() < skip or match.end() == len(data):
+                # The label line of the previous frame is a number, or the
+                # count line is the end of the file
+                continue
+            label_start = match.end() + 1
+            label_end = data.find(b"\n", label_start, end)
+            if label_end < 0:
+                if chunk:
+                    # The label line continues in the next chunk
+                    end = match.start()
+                    break
+                label_end = end
+            outfile.write(data[position:label_start])
+            position = label_start
+            frames += 1
+            # The new line keeps the line ending of the file
+            newline = b"\r\n" if data[match.end() - 1:match.end()] == b"\r" else b"\n"
+            line = data[label_start:label_end].decode()
+            if parse_atom(line.split()) is not None:
+                # A frame without energy/label line
+                line = ""
+                label_end = label_start
+            elif label_end < end:
+                newline = b"\r\n" if line.endswith("\r") else b"\n"
+                label_end += 1
+            skip = label_end
+            new_line = relabeler(line.rstrip("\r"))
+            if new_line is not None:
+                outfile.write(new_line.encode() + newline)
+                position = label_end
+        outfile.write(data[position:end])
+        pending = data[end:]
+        if not chunk:
+            return frames
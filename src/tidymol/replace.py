@@ -0,0 +1,160 @@
+"""Replacing the symbols of selected atoms
+
+A rule selects at most one atom of an element in every frame and gives it
+a new symbol, e.g. to tell apart the equivalent chlorine atoms of a
+molecule for a later analysis:
+
+* ``Cl:2=Ag``: the second Cl atom of every frame becomes Ag
+* ``Cl~H:1=Au``: of the Cl atoms of every frame the one closest to any
+  H atom becomes Au, ``:2`` would select the second closest
+
+All rules are matched against the original symbols, if two rules select
+the same atom the later one wins. Frames with the same sequence of atomic
+numbers are processed together, so a rule is a few NumPy operations on
+the atomic numbers and coordinates of all these frames.
+"""
+
+# Standard Library
+import re
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .constants import atomic_number
+from .parsers.molden import MoleculeEnsemble
+
+# Upper bound of the number of values computed at once
+BLOCK_SIZE = 1 << 22
+
+_RULE = re.compile(
+    r"^\s*(?P<symbol>\w+)\s*(?:~\s*(?P<neighbour>\w+)\s*)?"
+    r"(?::\s*(?P<position>\d+)\s*)?=\s*(?P<new_symbol>\w+)\s*$"
+)
+
+
+class OccurrenceRule(object):
+    """Selects the n-th atom of an element in every frame
+
+    :param symbol: The element of the selected atom
+    :param occurrence: The position of the atom among the atoms of its element, counted from 1
+    :param new_symbol: The new symbol of the selected atom
+    """
+
+    uses_coordinates = False
+
+    def __init__(self, symbol, occurrence, new_symbol):
+        if occurrence < 1:
+            raise ValueError("The occurrence is counted from 1")
+        self._number = atomic_number(symbol)
+        self._occurrence = occurrence
+        self._new_number = atomic_number(new_symbol)
+
+    @property
+    def new_number(self):
+        return self._new_number
+
+    def select(self, numbers, coordinates):
+        """Returns the index of the selected atom, -1 if there is none
+
+        :param numbers: The atomic numbers shared by the frames
+        :param coordinates: Not used, the atom is the same in all frames
+        """
+        candidates = np.flatnonzero(numbers == self._number)
+        if len(candidates) < self._occurrence:
+            return -1
+        return candidates[self._occurrence - 1]
+
+
+class NearestRule(object):
+    """Selects the atom of an element which is the n-th closest to any atom of another element
+
+    :param symbol: The element of the selected atom
+    :param neighbour: The element of the neighbours
+    :param rank: 1 selects the closest atom, 2 the second closest and so on
+    :param new_symbol: The new symbol of the selected atom
+    """
+
+    uses_coordinates = True
+
+    def __init__(self, symbol, neighbour, rank, new_symbol):
+        if rank < 1:
+            raise ValueError("The rank is counted from 1")
+        self._number = atomic_number(symbol)
+        self._neighbour = atomic_number(neighbour)
+        self._rank = rank
+        self._new_number = atomic_number(new_symbol)
+
+    @property
+    def new_number(self):
+        return self._new_number
+
+    def cost(self, numbers):
+        """Returns the number of distances per frame"""
+        return int(np.count_nonzero(numbers == self._number) * np.count_nonzero(numbers == self._neighbour))
+
+    def select(self, numbers, coordinates):
+        """Returns the index of the selected atom in every frame, -1 if there is none
+
+        :param numbers: The atomic numbers shared by the frames
+        :param coordinates: The coordinates of shape (frames, atoms, 3)
+        """
+        candidates = np.flatnonzero(numbers == self._number)
+        neighbours = np.flatnonzero(numbers == self._neighbour)
+        if len(candidates) < self._rank or not len(neighbours):
+            return -1
+        distances = np.linalg.norm(
+            coordinates[:, candidates, None, :] - coordinates[:, None, neighbours, :], axis=-1
+        )
+        # An atom is not its own neighbour
+        distances[:, candidates[:, None] == neighbours[None, :]] = np.inf
+        order = np.argsort(distances.min(axis=-1), axis=-1, kind="stable")
+        return candidates[order[:, self._rank - 1]]
+
+
+def parse_rule(text):
+    """Converts ``SYMBOL:N=NEW`` into an OccurrenceRule and ``SYMBOL~NEIGHBOUR[:N]=NEW`` into a NearestRule"""
+    match = _RULE.match(text)
+    if match is None:
+        raise ValueError("Can not parse the rule '{}'".format(text))
+    symbol, neighbour, position, new_symbol = match.group("symbol", "neighbour", "position", "new_symbol")
+    if neighbour is not None:
+        return NearestRule(symbol, neighbour, int(position or 1), new_symbol)
+    if position is None:
+        raise ValueError("The rule '{}' needs the occurrence of the atom, e.g. {}:1={}".format(
+            text, symbol, new_symbol))
+    return OccurrenceRule(symbol, int(position), new_symbol)
+
+
+def _selections(ensemble, numbers, frames, rules):
+    """Yields the rows and the new number of the atoms selected by every rule"""
+    offsets = ensemble.offsets[frames]
+    cost = len(numbers) * 3 + max([rule.cost(numbers) for rule in rules if rule.uses_coordinates] or [0])
+    chunk = max(1, BLOCK_SIZE // cost)
+    for start in range(0, len(frames), chunk):
+        starts = offsets[start:start + chunk]
+        coordinates = None
+        for rule in rules:
+            if rule.uses_coordinates and coordinates is None:
+                coordinates = ensemble.coordinates[starts[:, None] + np.arange(len(numbers))[None, :]]
+            indexes = np.broadcast_to(rule.select(numbers, coordinates), starts.shape)
+            valid = indexes >= 0
+            yield starts[valid] + indexes[valid], rule.new_number
+
+
+def replace_atoms(ensemble, rules):
+    """Returns a copy of the ensemble with the symbols of the selected atoms replaced
+
+    :param ensemble: The molecules
+    :type ensemble: MoleculeEnsemble
+    :param rules: OccurrenceRule or NearestRule objects, see parse_rule
+    :return: MoleculeEnsemble sharing the coordinates of ensemble
+    """
+    numbers = ensemble.numbers.copy()
+    if rules:
+        for group, frames in ensemble.groups():
+            for rows, new_number in _selections(ensemble, group, frames, rules):
+                numbers[rows] = new_number
+    return MoleculeEnsemble(
+        ensemble.labels, ensemble.energies, numbers, ensemble.coordinates, ensemble.offsets
+    )
@@ -0,0 +1,299 @@
+"""Columnar output of the analysis commands
+
+The analysis commands produce tables as dicts of NumPy columns. A sink
+takes such tables batch by batch and appends them to its output, so the
+results never have to be in memory at once:
+
+* csv: one header line and the rows of every batch, compressed by the
+  extension of the file like the molden output
+* npy: one structured array, loadable with ``numpy.load`` and directly
+  convertible with ``pandas.DataFrame``. The header is rewritten with the
+  number of rows when the sink is closed.
+* parquet and arrow: need the ``pyarrow`` package, every batch becomes a
+  row group or a record batch
+* table: the pandas text table of all rows, as printed before. Unlike the
+  other formats it collects all rows in memory until it is closed, large
+  results should be written as csv, npy, parquet or arrow.
+"""
+
+# Standard Library
+import abc
+import csv
+import os
+import struct
+
+# Third Party Libraries
+import numpy as np
+
+# Local imports
+from .compression import open_output
+
+FORMATS = ("table", "csv", "npy", "parquet", "arrow")
+
+SUFFIXES = {
+    ".csv": "csv",
+    ".npy": "npy",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+# Room for the number of rows which is only known when the sink is closed
+_NPY_DIGITS = 20
+
+
+def format_of(filename):
+    """Returns the format selected by the extension of filename or None
+
+    Compressed CSV files like ``results.csv.gz`` are recognised as well.
+    """
+    if not filename:
+        return None
+    for suffix, fileformat in SUFFIXES.items():
+        if filename.endswith(suffix) or suffix == ".csv" and ".csv." in filename:
+            return fileformat
+    return None
+
+
+def _import_pyarrow(fileformat):
+    """Returns the pyarrow module, which is only loaded by the commands writing parquet or arrow"""
+    try:
+        # Third Party Libraries
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("{} output needs the pyarrow package".format(fileformat))
+    return pyarrow
+
+
+def _temporary_path(filename):
+    """Returns the path of the file written until the sink is closed, None for stdout
+
+    The name ends like filename, so the extension still selects the compression.
+    """
+    if not filename or filename == "-":
+        return None
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, ".{}.tmp.{}".format(os.getpid(), name))
+
+
+class _Sink(abc.ABC):
+    """Appends tables to an output, the columns are fixed by the first table
+
+    A file is written under a temporary name and only renamed to filename
+    when the sink is closed, so a failed command leaves no truncated output.
+    Used in a with statement, an exception discards the output.
+    """
+
+    def __init__(self, filename=None):
+        self._filename = filename
+        self._path = _temporary_path(filename)
+        # The file the subclasses write to
+        self._output = filename if self._path is None else self._path
+        self._rows = 0
+
+    @property
+    def rows(self):
+        """The number of rows written so far"""
+        return self._rows
+
+    def write(self, columns):
+        """Appends a table
+
+        :param columns: dict of equally long columns
+        """
+        self._write(columns)
+        self._rows += len(next(iter(columns.values()))) if columns else 0
+
+    @abc.abstractmethod
+    def _write(self, columns):
+        """Appends a table to the output"""
+
+    def _close(self):
+        pass
+
+    def close(self):
+        """Finishes the output and moves it to its file"""
+        self._close()
+        if self._path is not None and os.path.exists(self._path):
+            os.replace(self._path, self._filename)
+
+    def discard(self):
+        """Closes the output and removes the written file"""
+        try:
+            self._close()
+        finally:
+            if self._path is not None and os.path.exists(self._path):
+                os.remove(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CsvSink(_Sink):
+    def __init__(self, filename=None, threads=1):
+        super().__init__(filename)
+        self._context = open_output(self._output, threads)
+        self._outfile = self._context.__enter__()
+        self._writer = csv.writer(self._outfile, lineterminator="\n")
+        self._header = False
+
+    def _write(self, columns):
+        if not self._header:
+            self._writer.writerow(list(columns))
+            self._header = True
+        self._writer.writerows(zip(*[np.asarray(values).tolist() for values in columns.values()]))
+
+    def _close(self):
+        self._context.__exit__(None, None, None)
+
+
+class NpySink(_Sink):
+    def __init__(self, filename):
+        if not filename or filename == "-":
+            raise ValueError("npy output needs a file")
+        super().__init__(filename)
+        self._outfile = open(self._output, "wb")
+        self._dtype = None
+        self._empty = np.dtype([])
+        self._size = None
+
+    def _header(self, rows):
+        header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+            np.lib.format.dtype_to_descr(self._dtype), rows
+        )
+        if self._size is None:
+            # Aligned to 64 bytes like numpy.save
+            self._size = -(-(len(_NPY_MAGIC) + 2 + len(header) + _NPY_DIGITS + 1) // 64) * 64
+        return _NPY_MAGIC + struct.pack("<H", self._size - len(_NPY_MAGIC) - 2) + (
+            header.ljust(self._size - len(_NPY_MAGIC) - 3) + "\n"
+        ).encode("latin1")
+
+    def _write(self, columns):
+        rows = len(next(iter(columns.values())))
+        if self._dtype is None:
+            dtype = np.dtype([(name, np.asarray(values).dtype) for name, values in columns.items()])
+            if not rows:
+                # The width of string columns is only known from real rows
+                self._empty = dtype
+                return
+            self._dtype = dtype
+            self._outfile.write(self._header(0))
+        table = np.empty(rows, dtype=self._dtype)
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if values.dtype.kind == "U" and values.dtype.itemsize > self._dtype[name].itemsize:
+                raise ValueError("The strings of column {} are longer than in the first batch".format(name))
+            table[name] = values
+        self._outfile.write(table.tobytes())
+
+    def _close(self):
+        if self._dtype is None:
+            self._dtype = self._empty
+            self._outfile.write(self._header(0))
+        else:
+            self._outfile.seek(0)
+            self._outfile.write(self._header(self._rows))
+        self._outfile.close()
+
+
+class ParquetSink(_Sink):
+    def __init__(self, filename):
+        super().__init__(filename)
+        self._pyarrow = _import_pyarrow("parquet")
+        self._writer = None
+        self._schema = None
+
+    def _write(self, columns):
+        table = self._pyarrow.table({name: np.asarray(values) for name, values in columns.items()})
+        if self._writer is None:
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._output, table.schema)
+            self._schema = table.schema
+        self._writer.write_table(table.cast(self._schema))
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ArrowSink(_Sink):
+    def __init__(self, filename):
+        super().__init__(filename)
+        self._pyarrow = _import_pyarrow("arrow")
+        self._writer = None
+        self._schema = None
+
+    def _write(self, columns):
+        table = self._pyarrow.table({name: np.asarray(values) for name, values in columns.items()})
+        if self._writer is None:
+            self._writer = self._pyarrow.ipc.new_file(self._output, table.schema)
+            self._schema = table.schema
+        self._writer.write_table(table.cast(self._schema))
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class TableSink(_Sink):
+    """Collects all tables and prints them as one pandas table when closed
+
+    The only sink whose memory grows with the number of rows.
+    """
+
+    def __init__(self, filename=None, threads=1):
+        super().__init__(filename)
+        self._threads = threads
+        self._tables = []
+
+    def _write(self, columns):
+        self._tables.append({name: np.asarray(values) for name, values in columns.items()})
+
+    def discard(self):
+        # Nothing is printed for a failed command
+        self._tables = []
+        super().discard()
+
+    def _close(self):
+        if not self._tables:
+            return
+        # Third Party Libraries
+        import pandas as pd
+
+        # Empty tables would turn the string columns into one character strings
+        tables = [table for table in self._tables if len(next(iter(table.values())))] or self._tables[:1]
+        columns = {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+        with open_output(self._output, self._threads) as outfile:
+            print(pd.DataFrame(columns), file=outfile)
+
+
+def open_sink(filename=None, fileformat=None, threads=1, default="table"):
+    """Opens a sink for the tables of an analysis command
+
+    :param filename: The output file, stdout if None or "-"
+    :param fileformat: One of FORMATS, by default selected by the extension of filename
+    :param threads: The number of compression threads of CSV and table output
+    :param default: The format if neither fileformat nor the extension selects one
+    :return: A sink with write(columns) and close(), usable in a with statement
+    """
+    fileformat = fileformat or format_of(filename) or default
+    if fileformat == "csv":
+        return CsvSink(filename, threads)
+    if fileformat == "npy":
+        return NpySink(filename)
+    if fileformat in ("parquet", "arrow"):
+        if not filename or filename == "-":
+            raise ValueError("{} output needs a file".format(fileformat))
+        return ParquetSink(filename) if fileformat == "parquet" else ArrowSink(filename)
+    if fileformat == "table":
+        return TableSink(filename, threads)
+    raise ValueError("Unknown result format '{}'".format(fileformat))
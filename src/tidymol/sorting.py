@@ -0,0 +1,69 @@
+"""Sorting of molden files which do not fit into memory
+
+Only the (energy, position) keys of the frames are sorted. If even the
+keys exceed the given limit, sorted runs of keys are spilled into
+temporary files and merged afterwards, so at most ``max_keys`` keys and
+one block per run are held in memory.
+"""
+
+# Standard Library
+import heapq
+import os
+import tempfile
+
+# Third Party Libraries
+import numpy as np
+
+# The number of keys read at once from a spilled run
+RUN_BLOCK_SIZE = 1 << 14
+
+_RUN_DTYPE = np.dtype([("energy", "<f8"), ("position", "<i8")])
+
+
+def _iter_run(path):
+    run = np.load(path, mmap_mode="r")
+    for start in range(0, len(run), RUN_BLOCK_SIZE):
+        block = np.array(run[start:start + RUN_BLOCK_SIZE])
+        for key in zip(block["energy"].tolist(), block["position"].tolist()):
+            yield key
+
+
+def argsort_energies(energies, max_keys=None):
+    """Yields the positions of the frames ordered by energy
+
+    Frames with the same energy keep their order.
+
+    :param energies: The energies of the frames, e.g. a memory mapped index column
+    :param max_keys: The maximum number of keys sorted in memory, None means no limit
+    :return: Generator of positions
+    """
+    if max_keys is None or len(energies) <= max_keys:
+        for position in np.argsort(energies, kind="stable").tolist():
+            yield position
+        return
+    with tempfile.TemporaryDirectory(prefix="tidymol-sort-") as directory:
+        runs = []
+        for start in range(0, len(energies), max_keys):
+            chunk = np.asarray(energies[start:start + max_keys], dtype=np.float64)
+            order = np.argsort(chunk, kind="stable")
+            run = np.empty(len(order), dtype=_RUN_DTYPE)
+            run["energy"] = chunk[order]
+            run["position"] = order + start
+            path = os.path.join(directory, "run{}.npy".format(len(runs)))
+            np.save(path, run)
+            runs.append(path)
+        for _, position in heapq.merge(*[_iter_run(path) for path in runs]):
+            yield position
+
+
+def lowest_energies(molecules, k):
+    """Returns the k molecules with the lowest energies in a single pass
+
+    :param molecules: An iterable of molecules, e.g. a streaming reader
+    :param k: The number of molecules
+    :return: List of molecules ordered by energy
+    """
+    lowest = heapq.nsmallest(
+        k, enumerate(molecules), key=lambda item: (item[1].energy, item[0])
+    )
+    return [molecule for _, molecule in lowest]
@@ -0,0 +1,18 @@
+# Standard Library
+import glob
+import os
+
+# Third Party Libraries
+import pytest
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+EXAMPLE_FILES = sorted(
+    glob.glob(os.path.join(EXAMPLES, "*.molden")) + glob.glob(os.path.join(EXAMPLES, "*", "*.molden"))
+)
+
+
+@pytest.fixture(params=EXAMPLE_FILES, ids=lambda path: os.path.relpath(path, EXAMPLES))
+def example_file(request):
+    """The path of every molden file of the examples"""
+    return request.param
@@ -0,0 +1,81 @@
+# Standard Library
+import struct
+
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol.cli import main
+from tidymol.exceptions import InvalidArchive
+from tidymol.parsers.archive import ARCHIVE_VERSION, MAGIC, is_archive, read_archive, write_archive
+from tidymol.parsers.molden import MoleculeEnsemble, read_ensemble
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+def assert_equal(ensemble, expected):
+    assert ensemble.labels.tolist() == expected.labels.tolist()
+    assert ensemble.energies.tolist() == expected.energies.tolist()
+    assert ensemble.numbers.tolist() == expected.numbers.tolist()
+    assert np.array_equal(ensemble.coordinates, expected.coordinates)
+    assert ensemble.offsets.tolist() == expected.offsets.tolist()
+
+
+def test_round_trip(molecules, tmp_path):
+    filename = str(tmp_path / "molecules.tmol")
+    write_archive(filename, molecules)
+    assert is_archive(filename)
+    assert_equal(read_archive(filename), molecules)
+
+
+def test_round_trip_of_unusual_frames(tmp_path):
+    ensemble = MoleculeEnsemble(
+        ["", "ümlaut", "a longer label"], [-1.5, 0.0, 2.25], [1, 17, 8, 1],
+        np.arange(12, dtype=float).reshape(4, 3), [0, 1, 1, 4],
+    )
+    filename = str(tmp_path / "unusual.tmol")
+    write_archive(filename, ensemble)
+    assert_equal(read_archive(filename), ensemble)
+
+
+def test_empty_archive(tmp_path):
+    filename = str(tmp_path / "empty.tmol")
+    write_archive(filename, MoleculeEnsemble([], [], [], [], [0]))
+    assert len(read_archive(filename)) == 0
+
+
+def test_changes_are_not_written_to_the_archive(molecules, tmp_path):
+    filename = str(tmp_path / "molecules.tmol")
+    write_archive(filename, molecules)
+    mapped = read_archive(filename)
+    mapped.mirror("x")
+    del mapped
+    assert_equal(read_archive(filename), molecules)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", MAGIC, b"NOTMOLDN" + bytes(56), struct.pack("<8sIqqI", MAGIC, ARCHIVE_VERSION + 1, 0, 0, 1)],
+    ids=["empty", "short", "magic", "version"],
+)
+def test_invalid_archives(tmp_path, data):
+    filename = tmp_path / "invalid.tmol"
+    filename.write_bytes(data)
+    with pytest.raises(InvalidArchive):
+        read_archive(str(filename))
+
+
+def test_convert_round_trip(example_file, molecules, tmp_path):
+    archive, molden = str(tmp_path / "molecules.tmol"), str(tmp_path / "molecules.molden")
+    runner = CliRunner()
+    assert runner.invoke(main, ["convert", example_file, archive]).exit_code == 0
+    assert runner.invoke(main, ["convert", archive, molden]).exit_code == 0
+    with open(molden) as infile:
+        assert_equal(read_ensemble(infile), molecules)
+    assert runner.invoke(main, ["sort", archive]).output == runner.invoke(main, ["sort", example_file]).output
@@ -0,0 +1,62 @@
+# Standard Library
+import io
+
+# Third Party Libraries
+import pytest
+
+# My Stuff
+from tidymol.compression import PrefetchReader, detect, open_input, open_output
+
+COMPRESSIONS = [(".gz", "gzip"), (".bz2", "bz2"), (".xz", "xz"), (".zst", "zstd")]
+
+
+@pytest.mark.parametrize("suffix, compression", COMPRESSIONS)
+@pytest.mark.parametrize("threads", [1, 2])
+def test_round_trip(example_file, tmp_path, suffix, compression, threads):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    with open(example_file) as infile:
+        text = infile.read()
+    filename = str(tmp_path / ("example.molden" + suffix))
+    with open_output(filename, threads) as outfile:
+        outfile.write(text)
+
+    assert detect(filename) == compression
+    with open_input(filename, chunk_size=4096) as infile:
+        assert infile.read() == text
+    with open_input(filename, binary=True) as infile:
+        assert infile.read() == text.encode()
+
+
+def test_plain_files_are_not_compressed(example_file, tmp_path):
+    filename = str(tmp_path / "example.molden")
+    with open(example_file) as infile, open_output(filename) as outfile:
+        outfile.write(infile.read())
+    assert detect(filename) is None
+    with open(example_file) as expected, open_input(filename) as infile:
+        assert infile.read() == expected.read()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 20])
+def test_prefetch_reader_returns_the_stream(chunk_size):
+    data = bytes(range(256)) * 100
+    with io.BufferedReader(PrefetchReader(io.BytesIO(data), chunk_size, prefetch=2)) as reader:
+        assert reader.read() == data
+
+
+def test_prefetch_reader_raises_the_errors_of_the_stream():
+    class Broken(io.RawIOBase):
+        def read(self, size=-1):
+            raise ValueError("broken")
+
+    reader = PrefetchReader(Broken())
+    with pytest.raises(ValueError, match="broken"):
+        reader.read(10)
+    reader.close()
+
+
+def test_closing_early_stops_the_thread():
+    reader = PrefetchReader(io.BytesIO(b"x" * (1 << 16)), chunk_size=16, prefetch=1)
+    assert reader.read(4) == b"xxxx"
+    reader.close()
+    assert not reader._thread.is_alive()
@@ -0,0 +1,114 @@
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol import dedupe
+from tidymol.dedupe import find_duplicates
+from tidymol.parsers.molden import MoleculeEnsemble, read_ensemble
+
+
+def rmsd(first, second):
+    """Returns the RMSD of two frames after the optimal proper rotation of first onto second"""
+    first = first - first.mean(axis=0)
+    second = second - second.mean(axis=0)
+    u, _, vt = np.linalg.svd(first.T @ second)
+    sign = np.sign(np.linalg.det(u @ vt))
+    rotation = u @ np.diag([1.0, 1.0, sign]) @ vt
+    return np.sqrt(np.mean(np.sum((first @ rotation - second) ** 2, axis=1)))
+
+
+def greedy(ensemble, threshold, energy_window=None):
+    """Keeps every frame in the order of the energies unless a kept frame is its duplicate"""
+    representatives = np.arange(len(ensemble))
+    distances = np.zeros(len(ensemble))
+    kept = []
+    for frame in np.argsort(ensemble.energies, kind="stable").tolist():
+        molecule = ensemble[frame]
+        for other in kept:
+            candidate = ensemble[other]
+            if candidate.numbers.tolist() != molecule.numbers.tolist():
+                continue
+            if energy_window is not None and abs(candidate.energy - molecule.energy) > energy_window:
+                continue
+            distance = rmsd(candidate.coordinates, molecule.coordinates)
+            if distance <= threshold:
+                representatives[frame] = other
+                distances[frame] = distance
+                break
+        else:
+            kept.append(frame)
+    return representatives, distances
+
+
+def rotation(seed):
+    q, r = np.linalg.qr(np.random.RandomState(seed).normal(size=(3, 3)))
+    q = q @ np.diag(np.sign(np.diag(r)))
+    return q * np.sign(np.linalg.det(q))
+
+
+def synthetic():
+    """Rotated and shifted copies with noise, enantiomers and reordered atoms of a chiral molecule"""
+    random = np.random.RandomState(4)
+    base = random.normal(scale=1.5, size=(6, 3))
+    numbers = [6, 1, 8, 17, 9, 1]
+    frames, energies = [], []
+    for index in range(60):
+        coordinates = base + random.normal(scale=0.03 * (index % 5), size=base.shape)
+        if index % 7 == 3:
+            coordinates[:, 0] *= -1
+        frames.append((numbers if index % 11 else numbers[::-1], coordinates @ rotation(index) + index))
+        energies.append(round(random.uniform(-1, 1), 1))
+    return MoleculeEnsemble(
+        [str(index) for index in range(len(frames))], energies,
+        np.concatenate([numbers for numbers, _ in frames]),
+        np.concatenate([coordinates for _, coordinates in frames]),
+        np.arange(len(frames) + 1) * len(base),
+    )
+
+
+@pytest.mark.parametrize("threshold", [0.01, 0.05, 0.1, 0.3])
+@pytest.mark.parametrize("energy_window", [None, 0.25])
+def test_synthetic_frames_match_the_greedy_reference(monkeypatch, threshold, energy_window):
+    # Small blocks split the cells into several work units
+    monkeypatch.setattr(dedupe, "BLOCK_SIZE", 200)
+    ensemble = synthetic()
+    representatives, distances = find_duplicates(ensemble, threshold, energy_window)
+    expected, expected_distances = greedy(ensemble, threshold, energy_window)
+    assert representatives.tolist() == expected.tolist()
+    assert np.allclose(distances, expected_distances, atol=1e-6)
+
+
+def test_enantiomers_are_not_duplicates():
+    ensemble = synthetic()
+    mirrored = ensemble.mirrored("x", compare=True)
+    representatives, _ = find_duplicates(mirrored, 0.01)
+    frames = np.arange(0, len(mirrored), 2)
+    # No frame is a duplicate of its own mirror image
+    assert not np.any(representatives[frames + 1] == frames)
+    assert not np.any(representatives[frames] == frames + 1)
+
+
+@pytest.mark.parametrize("threshold", [0.05, 0.5])
+def test_examples_match_the_greedy_reference(example_file, threshold):
+    with open(example_file) as infile:
+        ensemble = read_ensemble(infile)
+    representatives, distances = find_duplicates(ensemble, threshold)
+    expected, expected_distances = greedy(ensemble, threshold)
+    assert representatives.tolist() == expected.tolist()
+    assert np.allclose(distances, expected_distances, atol=1e-6)
+
+
+def test_processes_find_the_same_duplicates(monkeypatch):
+    monkeypatch.setattr(dedupe, "BLOCK_SIZE", 200)
+    ensemble = synthetic()
+    serial = find_duplicates(ensemble, 0.1)
+    parallel = find_duplicates(ensemble, 0.1, jobs=2)
+    assert serial[0].tolist() == parallel[0].tolist()
+    assert np.allclose(serial[1], parallel[1])
+
+
+@pytest.mark.parametrize("threshold, energy_window", [(0, None), (-1, None), (0.1, 0)])
+def test_invalid_parameters(threshold, energy_window):
+    with pytest.raises(ValueError):
+        find_duplicates(synthetic(), threshold, energy_window)
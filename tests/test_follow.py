@@ -0,0 +1,75 @@
+# Standard Library
+import threading
+
+# Third Party Libraries
+import numpy as np
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol.cli import main
+from tidymol.parsers.molden.follow import follow_batches
+from tidymol.parsers.molden.reader import complete_frames
+
+FRAMES = [
+    "3\n-1.5     first\nO 0.0 0.0 0.0\nH 0.0 0.0 1.0\nH 0.0 1.0 0.0\n",
+    "2\n-2.5     second\nCl 0.0 0.0 0.0\nH 1.0 0.0 0.0\n",
+    "1\n-0.5\nAu 0.0 0.0 0.0\n",
+]
+
+
+def test_complete_frames_stops_before_a_partially_written_frame():
+    lines = "".join(FRAMES).splitlines(keepends=True)
+    boundaries = np.cumsum([0] + [frame.count("\n") for frame in FRAMES])
+    for cut in range(len(lines) + 1):
+        expected = boundaries[boundaries <= cut].max()
+        assert complete_frames(lines[:cut]) == expected, cut
+
+
+def test_complete_frames_skips_lines_outside_of_frames():
+    lines = ("\n" + FRAMES[0] + "\n" + FRAMES[1]).splitlines(keepends=True)
+    assert complete_frames(lines) == len(lines)
+    # The count line of the second frame is written, its atoms are not
+    assert complete_frames(lines[:-2]) == len(FRAMES[0].splitlines()) + 2
+
+
+def append_later(filename, parts, delay=0.1):
+    """Appends the parts to the file one after the other in a background thread"""
+    def run():
+        for part in parts:
+            threading.Event().wait(delay)
+            with open(filename, "a") as outfile:
+                outfile.write(part)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_follow_yields_only_batches_with_molecules(tmp_path):
+    filename = str(tmp_path / "running.molden")
+    with open(filename, "w") as outfile:
+        outfile.write("\n")
+    # The second frame is written in pieces, the first piece ends within an atom line
+    second = FRAMES[1]
+    split = second.index("H 1.0") + 3
+    thread = append_later(filename, ["\n" + FRAMES[0] + second[:split], second[split:]])
+    batches = list(follow_batches(filename, interval=0.01, timeout=0.5))
+    thread.join()
+
+    assert [[molecule.label for molecule in batch] for batch in batches] == [["first"], ["second"]]
+
+
+def test_info_follow_starts_with_a_blank_line(tmp_path):
+    filename = str(tmp_path / "running.molden")
+    with open(filename, "w") as outfile:
+        outfile.write("\n\n")
+    thread = append_later(filename, ["\n", FRAMES[0], FRAMES[1][:10]])
+    result = CliRunner().invoke(main, ["info", "--follow", "--interval", "0.01", "--timeout", "0.5", filename])
+    thread.join()
+
+    assert result.exit_code == 0, result.output
+    # One line per batch, the partially written frame is only read when following stops
+    assert result.output.splitlines() == [
+        "Number of Molecules: 1    Lowest energy: -1.500000000 first",
+        "Number of Molecules: 2    Lowest energy: -2.500000000 ",
+    ]
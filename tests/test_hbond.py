@@ -0,0 +1,122 @@
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol import cli
+from tidymol.hbond import COLUMNS, donor_sets, hydrogen_bonds, scan_hydrogen_bonds
+from tidymol.parsers.molden import read_ensemble
+
+SETS = [("O", ("O",)), ("Cl", ("O", "H")), ("O", ("Cl",))]
+
+
+def brute_force(molecules, sets, max_r1=None, max_r2=None):
+    """Searches the closest hydrogen and acceptor of every donor atom atom by atom"""
+    rows = []
+    for frame, molecule in enumerate(molecules):
+        symbols = list(molecule.symbols)
+        coordinates = molecule.coordinates
+        for donor in range(len(symbols)):
+            for index, (symbol, acceptors) in enumerate(sets):
+                if symbols[donor] != symbol:
+                    continue
+                hydrogens = [atom for atom in range(len(symbols)) if symbols[atom] == "H" and atom != donor]
+                if not hydrogens:
+                    continue
+                r1, hydrogen = min((np.linalg.norm(coordinates[atom] - coordinates[donor]), atom) for atom in hydrogens)
+                candidates = [
+                    atom for atom in range(len(symbols))
+                    if symbols[atom] in set(acceptors) | {symbol} and atom not in (donor, hydrogen)
+                ]
+                if not candidates:
+                    continue
+                r2, acceptor = min(
+                    (np.linalg.norm(coordinates[atom] - coordinates[hydrogen]), atom) for atom in candidates
+                )
+                if max_r1 is not None and r1 > max_r1 or max_r2 is not None and r2 > max_r2:
+                    continue
+                rows.append((frame, donor + 1, index, hydrogen + 1, acceptor + 1, (r1 - r2) / 2, r1 + r2,
+                             "{}-H-{}".format(symbol, symbols[acceptor])))
+    rows.sort(key=lambda row: row[:3])
+    return rows
+
+
+def as_rows(results):
+    return list(zip(*[np.asarray(results[column]).tolist() for column in COLUMNS]))
+
+
+def assert_matches(results, expected):
+    assert len(results["molecules"]) == len(expected)
+    rows = as_rows(results)
+    for row, (frame, donor, _, hydrogen, acceptor, q1, q2, kind) in zip(rows, expected):
+        assert row[:4] == (frame, donor, hydrogen, acceptor)
+        assert row[4] == pytest.approx(q1) and row[5] == pytest.approx(q2)
+        assert row[6] == kind
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+def test_scan_matches_brute_force(molecules):
+    assert_matches(scan_hydrogen_bonds(molecules, SETS), brute_force(molecules, SETS))
+
+
+def test_distance_limits_match_brute_force(molecules):
+    assert_matches(
+        scan_hydrogen_bonds(molecules, SETS, max_r1=1.1, max_r2=2.0),
+        brute_force(molecules, SETS, max_r1=1.1, max_r2=2.0),
+    )
+
+
+def test_one_donor_is_one_set(molecules):
+    expected = scan_hydrogen_bonds(molecules, donor_sets("O", ("Cl",)))
+    results = hydrogen_bonds(molecules, "O", ("Cl",))
+    assert as_rows(results) == as_rows(expected)
+
+
+def test_failed_analysis_leaves_no_output(example_file, tmp_path, monkeypatch):
+    iter_ensembles = cli.iter_ensembles
+    calls = []
+
+    def fail_on_second_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("analysis failed")
+        return scan_hydrogen_bonds(*args, **kwargs)
+
+    monkeypatch.setattr(cli, "iter_ensembles", lambda filename, strict: iter_ensembles(filename, strict, size=2))
+    monkeypatch.setattr(cli, "scan_hydrogen_bonds", fail_on_second_batch)
+    output = tmp_path / "distances.csv"
+    result = CliRunner().invoke(cli.main, ["shortest-distance", "-s", "O", "-o", str(output), example_file])
+    assert isinstance(result.exception, RuntimeError)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_input_leaves_no_output(tmp_path):
+    filename = tmp_path / "empty.molden"
+    filename.write_text("")
+    output = tmp_path / "distances.npy"
+    result = CliRunner().invoke(cli.main, ["shortest-distance", "-s", "O", "-o", str(output), str(filename)])
+    assert result.exit_code != 0
+    assert not output.exists()
+
+
+def test_several_symbols_in_one_pass(example_file, molecules, tmp_path):
+    output = tmp_path / "distances.npy"
+    args = ["shortest-distance", "-s", "O", "-s", "Cl:O,H", "-o", str(output), example_file]
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 0, result.output
+    table = np.load(str(output))
+    expected = brute_force(molecules, donor_sets("O") + [("Cl", ("O", "H"))])
+    assert table["molecules"].tolist() == [row[0] for row in expected]
+    assert table["types"].tolist() == [row[7] for row in expected]
+
+
+def test_unknown_symbol_is_rejected(example_file):
+    result = CliRunner().invoke(cli.main, ["shortest-distance", "-s", "O:Xx", example_file])
+    assert result.exit_code == 2
+    assert "Unknown element symbol 'Xx'" in result.output
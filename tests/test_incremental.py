@@ -0,0 +1,62 @@
+# Third Party Libraries
+import numpy as np
+
+# My Stuff
+from tidymol.incremental import ResultCache, frame_hashes
+from tidymol.parsers.molden import read_ensemble
+from tidymol.parsers.molden.index import IndexedMoldenFile
+from tidymol.parsers.molden.writer import write_molden
+
+
+def chlorine_rows(molecules, positions):
+    """One row per Cl atom of the frames at positions, like the analysis commands"""
+    ensemble = molecules.take(positions)
+    rows = [
+        (frame, index)
+        for frame, molecule in enumerate(ensemble)
+        for index in molecule.get_indexes_by_symbol("Cl")
+    ]
+    frames, indexes = np.array(rows, dtype=np.int64).reshape(-1, 2).T
+    return {"molecules": frames, "indexes": indexes}
+
+
+def merge(cache, filename, computed):
+    with IndexedMoldenFile(filename) as molecules:
+        def compute(positions):
+            computed.append(positions.tolist())
+            return chlorine_rows(molecules, positions)
+
+        results = cache.merge(frame_hashes(molecules), compute)
+        expected = chlorine_rows(molecules, np.arange(len(molecules)))
+    return results, expected
+
+
+def test_merge_computes_only_the_appended_frames(example_file, tmp_path):
+    with open(example_file) as infile:
+        molecules = read_ensemble(infile)
+    half = len(molecules) // 2
+    filename = str(tmp_path / "growing.molden")
+    cache = ResultCache("test", {}, directory=str(tmp_path / "cache"))
+
+    with open(filename, "w") as outfile:
+        write_molden(outfile, molecules[:half])
+    computed = []
+    results, expected = merge(cache, filename, computed)
+    assert computed == [list(range(half))]
+    for name in expected:
+        np.testing.assert_array_equal(results[name], expected[name])
+
+    with open(filename, "a") as outfile:
+        write_molden(outfile, molecules[half:])
+    computed = []
+    results, expected = merge(cache, filename, computed)
+    assert computed == [list(range(half, len(molecules)))]
+    for name in expected:
+        np.testing.assert_array_equal(results[name], expected[name])
+
+    # Nothing is computed for an unchanged file
+    computed = []
+    results, expected = merge(cache, filename, computed)
+    assert computed == []
+    for name in expected:
+        np.testing.assert_array_equal(results[name], expected[name])
@@ -0,0 +1,60 @@
+# Standard Library
+import shutil
+
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol.cli import main
+from tidymol.exceptions import NoMolecules
+from tidymol.parsers.molden import read_ensemble
+from tidymol.parsers.molden.index import IndexedMoldenFile, build_index, load_index, scan_frames
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 1 << 14])
+def test_blocks_give_the_records_of_the_scan(tmp_path, block_size):
+    labels = ["", "a", "", "abc", "ab", "a much longer label", "x"] * 3
+    filename = str(tmp_path / "labels.molden")
+    with open(filename, "w") as outfile:
+        for index, label in enumerate(labels):
+            outfile.write("1\n{}     {}\nH 0.0 0.0 {}\n".format(-index, label, index))
+    with open(filename, "rb") as infile:
+        expected = list(scan_frames(infile))
+
+    with open(str(tmp_path / "index"), "w+b") as outfile:
+        count, label_width = build_index(filename, outfile, block_size)
+    assert count == len(expected)
+    assert label_width >= max(len(label) for label in labels)
+
+    records = load_index(filename)
+    assert records.tolist() == [tuple(record) for record in np.array(expected, dtype=records.dtype)]
+
+
+def test_frames_of_the_index_match_the_reader(example_file, tmp_path):
+    # The index is stored next to the molden file
+    filename = str(tmp_path / "example.molden")
+    shutil.copyfile(example_file, filename)
+    with open(filename) as infile:
+        expected = read_ensemble(infile)
+    with IndexedMoldenFile(filename) as molecules:
+        assert len(molecules) == len(expected)
+        assert molecules.labels.tolist() == expected.labels.tolist()
+        np.testing.assert_array_equal(molecules.energies, expected.energies)
+        np.testing.assert_array_equal(molecules.numbers_of_atoms, expected.numbers_of_atoms)
+        taken = molecules.take(range(len(molecules)))
+    np.testing.assert_array_equal(taken.coordinates, expected.coordinates)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [["info", "{}"], ["sort", "{}"], ["sort", "--top", "2", "{}"], ["filter", "-f", "{}", "{}"],
+     ["mirror", "{}"], ["dedupe", "{}"], ["replace-atoms", "-r", "Cl:1=Au", "{}"], ["relabel", "{}", "{{index}}"],
+     ["shortest-distance", "-s", "O", "{}"], ["pipe", "{}", "sort"]],
+)
+def test_every_command_rejects_a_file_without_molecules(tmp_path, command):
+    filename = tmp_path / "empty.molden"
+    filename.write_text("")
+    result = CliRunner().invoke(main, [argument.format(filename) for argument in command])
+    assert isinstance(result.exception, NoMolecules)
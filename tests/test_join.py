@@ -0,0 +1,66 @@
+# Standard Library
+import os
+
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol.cli import main
+from tidymol.join import match_energies, match_labels
+from tidymol.parsers.molden import read_ensemble
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "filter")
+
+# The labels of the complete file are a subset of the labels of the other one
+FILTER = os.path.join(EXAMPLES, "HCl_3n3_complete.molden")
+DELTA = os.path.join(EXAMPLES, "deltaE_HCl_n3.molden")
+
+
+def read(filename):
+    with open(filename) as infile:
+        return read_ensemble(infile)
+
+
+def test_match_labels():
+    labels = ["a", "b", "", "a", "c.out", "b "]
+    keys = ["b", "a", "b", "d"]
+    assert match_labels(labels, keys).tolist() == [label in keys for label in labels]
+    assert match_labels(labels, []).tolist() == [False] * len(labels)
+    assert match_labels([], keys).tolist() == []
+
+
+@pytest.mark.parametrize("tolerance", [0.0, 1e-6, 0.05, 0.5])
+def test_match_energies_matches_the_nested_loop(tolerance):
+    random = np.random.RandomState(2)
+    keys = np.round(random.normal(size=40), 2)
+    energies = np.concatenate([keys[:10], np.round(random.normal(scale=2, size=200), 2), [-10.0, 10.0]])
+    expected = [any(abs(energy - key) <= tolerance for key in keys) for energy in energies]
+    assert match_energies(energies, keys, tolerance).tolist() == expected
+
+
+def test_match_energies_without_keys():
+    assert match_energies([1.0, 2.0], [], 1.0).tolist() == [False, False]
+
+
+@pytest.mark.parametrize("strict", [[], ["--strict"]])
+@pytest.mark.parametrize("exclude", [[], ["--exclude"]])
+def test_filter_keeps_the_frames_of_the_filter_labels(strict, exclude):
+    molecules, keys = read(DELTA), set(read(FILTER).labels)
+    result = CliRunner().invoke(main, strict + ["filter", "-f", FILTER] + exclude + [DELTA])
+    assert result.exit_code == 0, result.output
+    written = read_ensemble(result.output.splitlines(True))
+    expected = [label for label in molecules.labels if (label in keys) != bool(exclude)]
+    assert written.labels.tolist() == expected
+    assert 0 < len(expected) < len(molecules)
+
+
+def test_filter_by_energy():
+    molecules, keys = read(DELTA), read(FILTER).energies
+    result = CliRunner().invoke(main, ["filter", "-f", FILTER, "--by", "energy", "--tolerance", "1e-6", DELTA])
+    assert result.exit_code == 0, result.output
+    written = read_ensemble(result.output.splitlines(True))
+    expected = [energy for energy in molecules.energies if np.any(np.abs(keys - energy) <= 1e-6)]
+    assert expected
+    assert written.energies.tolist() == pytest.approx(expected)
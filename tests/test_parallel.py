@@ -0,0 +1,68 @@
+# Standard Library
+import os
+
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol import parallel
+from tidymol.hbond import COLUMNS, donor_sets, scan_hydrogen_bonds
+from tidymol.parallel import map_ensemble, map_units, workers
+from tidymol.parsers.molden import read_ensemble
+
+
+def _summary(ensemble, unit):
+    start, stop = unit
+    part = ensemble[start:stop]
+    return list(part.labels), part.energies.tolist(), float(part.coordinates.sum()), part.numbers.tolist()
+
+
+def _pid(ensemble, unit):
+    return os.getpid()
+
+
+def _frames(ensemble):
+    return len(ensemble)
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+def test_results_are_in_the_order_of_the_units(molecules):
+    units = [(start, start + 1) for start in reversed(range(len(molecules)))]
+    assert map_units(_summary, molecules, units, jobs=2) == map_units(_summary, molecules, units, jobs=1)
+
+
+def test_map_ensemble_covers_every_frame(molecules):
+    results = map_ensemble(_frames, molecules, jobs=2, chunksize=2)
+    assert [start for start, _ in results] == list(range(0, len(molecules), 2))
+    assert sum(frames for _, frames in results) == len(molecules)
+
+
+def test_scan_in_processes_matches_the_serial_scan(molecules):
+    sets = donor_sets("O") + donor_sets("Cl", ("O",))
+    serial = scan_hydrogen_bonds(molecules, sets)
+    results = scan_hydrogen_bonds(molecules, sets, jobs=2)
+    for column in COLUMNS:
+        assert np.array_equal(results[column], serial[column])
+
+
+@pytest.mark.skipif(parallel.shared_memory is None, reason="needs multiprocessing.shared_memory")
+def test_workers_reuse_one_pool(molecules):
+    units = [(start, start + 1) for start in range(len(molecules))] * 8
+    with workers(2):
+        pool = parallel._WORKERS.pool()
+        first = set(map_units(_pid, molecules, units, jobs=2))
+        # A new ensemble, like the next batch of a file
+        assert map_units(_summary, molecules[::-1], units, jobs=2) == map_units(
+            _summary, molecules[::-1], units, jobs=1
+        )
+        second = set(map_units(_pid, molecules, units, jobs=2))
+        assert parallel._WORKERS.pool() is pool
+    assert first | second <= {process.pid for process in pool._pool}
+    assert os.getpid() not in first
+    assert parallel._WORKERS is None
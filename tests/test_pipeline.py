@@ -0,0 +1,65 @@
+# Standard Library
+import os
+
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol.cli import main
+from tidymol.parsers.molden import read_ensemble
+from tidymol.pipeline import Pipeline
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "filter")
+FILTER = os.path.join(EXAMPLES, "HCl_3n3_complete.molden")
+MOLECULES = os.path.join(EXAMPLES, "deltaE_HCl_n3.molden")
+
+
+def read(filename):
+    with open(filename) as infile:
+        return read_ensemble(infile)
+
+
+def invoke(*args):
+    result = CliRunner().invoke(main, [str(argument) for argument in args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_stages_are_lazy():
+    consumed = []
+
+    def molecules():
+        for molecule in read(MOLECULES):
+            consumed.append(molecule.label)
+            yield molecule
+
+    keys = read(FILTER).labels
+    pipeline = Pipeline(molecules()).filter(keys).mirror(compare=True)
+    assert consumed == []
+    first = next(iter(pipeline))
+    assert consumed == [first.label]
+
+
+def test_pipe_matches_the_single_commands(tmp_path):
+    filtered = tmp_path / "filtered.molden"
+    invoke("filter", "-f", FILTER, "-o", filtered, MOLECULES)
+    expected = invoke("mirror", "--compare", "--plane", "z", filtered)
+    assert invoke("pipe", MOLECULES, "filter", "-f", FILTER, "mirror", "--compare", "--plane", "z", "sort") == expected
+
+
+def test_pipe_filters_by_energy_and_keeps_the_top_molecules():
+    expected = read_ensemble(invoke("filter", "-f", FILTER, "--by", "energy", "--exclude", MOLECULES).splitlines(True))
+    expected = expected.sorted()[:5]
+    output = invoke("pipe", MOLECULES, "filter", "-f", FILTER, "--by", "energy", "--exclude", "sort", "--top", "5")
+    written = read_ensemble(output.splitlines(True))
+    assert written.labels.tolist() == expected.labels.tolist()
+    assert np.allclose(written.coordinates, expected.coordinates)
+
+
+@pytest.mark.parametrize("strict", [[], ["--strict"]])
+def test_replace_in_pipe_matches_replace_atoms(strict):
+    rules = ["-r", "Cl:1=Au", "-r", "Cl~H:1=Ag"]
+    expected = invoke(*(strict + ["replace-atoms"] + rules + [MOLECULES]))
+    assert invoke("pipe", MOLECULES, "replace", *rules) == expected
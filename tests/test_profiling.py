@@ -0,0 +1,74 @@
+# Standard Library
+import json
+import pstats
+
+# Third Party Libraries
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol import profiling
+from tidymol.cli import main
+from tidymol.profiling import stage
+
+
+@pytest.fixture
+def profiler():
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_stages_do_nothing_while_disabled():
+    assert not profiling.enabled()
+    with stage("read") as timer:
+        timer.count(10, 100)
+    assert profiling.disable() is None
+
+
+def test_stages_sum_their_runs(profiler):
+    for frames in (2, 3):
+        with stage("outer") as outer:
+            outer.count(frames, 10 * frames)
+            with stage("inner") as inner:
+                inner.count(1)
+    outer, inner = profiler.stages
+    assert (outer.name, outer.depth, outer.calls, outer.frames, outer.atoms) == ("outer", 0, 2, 5, 50)
+    assert (inner.name, inner.depth, inner.calls, inner.frames, inner.atoms) == ("inner", 1, 2, 2, 0)
+    assert outer.seconds >= inner.seconds >= 0
+    assert "outer: " in str(outer) and "in 2 calls" in str(outer) and "5 frames" in str(outer)
+    assert str(inner).startswith("  inner: ")
+
+
+def test_an_exception_ends_the_stage(profiler):
+    with pytest.raises(RuntimeError):
+        with stage("failing"):
+            raise RuntimeError()
+    with stage("next"):
+        pass
+    failing, following = profiler.stages
+    assert failing.calls == 1
+    assert following.depth == 0
+
+
+def test_profile_of_a_command(example_file, tmp_path):
+    report, statistics = tmp_path / "profile.json", tmp_path / "profile.stats"
+    result = CliRunner().invoke(main, [
+        "--strict", "--profile-json", str(report), "--profile-stats", str(statistics),
+        "sort", "-o", str(tmp_path / "sorted.molden"), example_file,
+    ])
+    assert result.exit_code == 0, result.output
+    assert not profiling.enabled()
+    with open(str(report)) as infile:
+        profile = json.load(infile)
+    stages = {entry["name"]: entry for entry in profile["stages"]}
+    assert profile["stages"][0]["name"] == "sort"
+    assert {"read_file", "read", "write", "format"} <= set(stages)
+    assert stages["read_file"]["frames"] == stages["write"]["frames"] > 0
+    assert stages["format"]["depth"] > stages["write"]["depth"] > stages["sort"]["depth"]
+    assert pstats.Stats(str(statistics)).total_calls > 0
+
+
+def test_no_profile_without_the_options(example_file):
+    result = CliRunner().invoke(main, ["info", example_file])
+    assert result.exit_code == 0, result.output
+    assert not profiling.enabled()
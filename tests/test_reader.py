@@ -0,0 +1,32 @@
+# Standard Library
+import io
+
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol.parsers.molden import parse, read_ensemble
+from tidymol.parsers.molden.reader import read_chunks
+
+def test_streaming_reader_matches_strict_parser(example_file):
+    with open(example_file) as infile:
+        streamed = read_ensemble(infile)
+    with open(example_file, "rb") as infile:
+        strict = parse("".join(read_chunks(infile)), strict=True)
+
+    assert len(streamed) == len(strict)
+    assert streamed.labels.tolist() == strict.labels.tolist()
+    np.testing.assert_array_equal(streamed.energies, strict.energies)
+    np.testing.assert_array_equal(streamed.numbers, strict.numbers)
+    np.testing.assert_array_equal(streamed.coordinates, strict.coordinates)
+    np.testing.assert_array_equal(streamed.offsets, strict.offsets)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_read_chunks_does_not_depend_on_chunk_size(example_file, chunk_size):
+    with open(example_file, "rb") as infile:
+        data = infile.read()
+    expected = "\n".join(line.rstrip(" ") for line in data.decode().splitlines())
+    text = "".join(read_chunks(io.BytesIO(data), chunk_size))
+    assert text.rstrip("\n") == expected.rstrip("\n")
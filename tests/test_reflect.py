@@ -0,0 +1,82 @@
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol import parsers
+from tidymol.cli import main
+from tidymol.parsers.molden import plane_normal, read_ensemble, reflect
+from tidymol.pipeline import mirror_molecules
+
+PLANES = ["x", "y", "z", (1.0, 1.0, 0.0), (0.3, -2.0, 0.7)]
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+@pytest.fixture(params=[1 << 16, 5], ids=["one-block", "small-blocks"])
+def block_size(request, monkeypatch):
+    monkeypatch.setattr(parsers.molden, "REFLECT_BLOCK_SIZE", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("plane", PLANES)
+def test_reflect_matches_the_householder_matrix(plane, block_size):
+    coordinates = np.random.RandomState(0).normal(size=(23, 3))
+    normal = plane_normal(plane)
+    expected = coordinates @ (np.eye(3) - 2 * np.outer(normal, normal))
+    reflect(coordinates, plane)
+    assert np.allclose(coordinates, expected)
+
+
+def test_axis_planes_match_their_normals():
+    coordinates = np.random.RandomState(1).normal(size=(7, 3))
+    for axis, normal in [("x", (2.0, 0, 0)), ("y", (0, 1.0, 0)), ("z", (0, 0, -3.0))]:
+        by_axis, by_normal = coordinates.copy(), coordinates.copy()
+        reflect(by_axis, axis)
+        reflect(by_normal, normal)
+        assert np.allclose(by_axis, by_normal)
+
+
+@pytest.mark.parametrize("plane", ["w", (0, 0, 0)])
+def test_invalid_planes(plane):
+    with pytest.raises(ValueError):
+        plane_normal(plane)
+
+
+@pytest.mark.parametrize("plane", PLANES)
+def test_mirrored_pairs_match_the_streamed_mirror(molecules, plane, block_size):
+    coordinates = molecules.coordinates.copy()
+    mirrored = molecules.mirrored(plane, compare=True)
+    expected = list(mirror_molecules(iter(molecules), compare=True, plane=plane))
+    assert len(mirrored) == len(expected) == 2 * len(molecules)
+    for molecule, reference in zip(mirrored, expected):
+        assert molecule.label == reference.label
+        assert molecule.energy == reference.energy
+        assert molecule.numbers.tolist() == reference.numbers.tolist()
+        assert np.allclose(molecule.coordinates, reference.coordinates)
+    assert np.array_equal(molecules.coordinates, coordinates)
+
+
+@pytest.mark.parametrize("plane", PLANES)
+def test_mirrored_copy(molecules, plane):
+    mirrored = molecules.mirrored(plane)
+    assert mirrored.labels.tolist() == ["ent_" + label for label in molecules.labels]
+    for molecule, reference in zip(mirrored, mirror_molecules(iter(molecules), plane=plane)):
+        assert molecule.label == reference.label
+        assert np.allclose(molecule.coordinates, reference.coordinates)
+
+
+@pytest.mark.parametrize("strict", [[], ["--strict"]])
+def test_mirror_command_sorts_and_mirrors(example_file, molecules, strict):
+    result = CliRunner().invoke(main, strict + ["mirror", "--compare", "--plane", "1,1,0", example_file])
+    assert result.exit_code == 0, result.output
+    written = read_ensemble(result.output.splitlines(True))
+    expected = list(mirror_molecules(molecules.sorted(), compare=True, plane=(1, 1, 0)))
+    assert written.labels.tolist() == [molecule.label for molecule in expected]
+    assert written.energies.tolist() == pytest.approx([molecule.energy for molecule in expected])
+    assert np.allclose(written.coordinates, np.concatenate([molecule.coordinates for molecule in expected]))
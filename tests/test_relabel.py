@@ -0,0 +1,59 @@
+# Standard Library
+import io
+
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol.exceptions import LabelMismatch
+from tidymol.parsers.molden import read_ensemble
+from tidymol.relabel import Relabeler, relabel_frames
+
+TEMPLATE = "{energy:.3f}     frame_{index:04d}_{label}"
+
+
+def relabel(data, chunk_size, template=TEMPLATE, **options):
+    outfile = io.BytesIO()
+    frames = relabel_frames(io.BytesIO(data), outfile, Relabeler(template, **options), chunk_size)
+    return frames, outfile.getvalue()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 17, 256, 4096])
+def test_output_does_not_depend_on_chunk_size(example_file, chunk_size):
+    with open(example_file, "rb") as infile:
+        data = infile.read()
+    assert relabel(data, chunk_size) == relabel(data, 1 << 20)
+
+
+def test_only_the_label_lines_change(example_file):
+    with open(example_file, "rb") as infile:
+        data = infile.read()
+    frames, relabeled = relabel(data, 64)
+    original = read_ensemble(io.StringIO(data.decode()))
+    molecules = read_ensemble(io.StringIO(relabeled.decode()))
+
+    assert frames == len(original)
+    assert molecules.labels.tolist() == [
+        "frame_{:04d}_{}".format(index, label) for index, label in enumerate(original.labels, 1)
+    ]
+    np.testing.assert_allclose(molecules.energies, original.energies, atol=5e-4)
+    np.testing.assert_array_equal(molecules.numbers, original.numbers)
+    np.testing.assert_array_equal(molecules.coordinates, original.coordinates)
+
+
+def test_pattern_groups_and_mismatches():
+    data = b"1\n-1.0     run_12.out\nH 0 0 0\n1\n-2.0     other\nH 0 0 0\n"
+    frames, relabeled = relabel(data, 5, "{1}_{index}", pattern=r"run_(\d+)\.out")
+    assert frames == 2
+    assert relabeled == b"1\n12_1\nH 0 0 0\n1\n-2.0     other\nH 0 0 0\n"
+    with pytest.raises(LabelMismatch):
+        relabel(data, 5, "{1}", pattern=r"run_(\d+)\.out", require_match=True)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4096])
+def test_crlf_line_endings_are_kept(chunk_size):
+    data = b"1\r\n-1.0     a\r\nH 0 0 0\r\n1\r\nH 0 0 0\r\n1\n-3.0     c\nH 0 0 0\n"
+    frames, relabeled = relabel(data, chunk_size, "{index}_{label}")
+    assert frames == 3
+    assert relabeled == b"1\r\n1_a\r\nH 0 0 0\r\n1\r\n2_\r\nH 0 0 0\r\n1\n3_c\nH 0 0 0\n"
@@ -0,0 +1,91 @@
+# Standard Library
+import os
+
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol import replace
+from tidymol.cli import main
+from tidymol.parsers.molden import read_ensemble
+from tidymol.replace import NearestRule, OccurrenceRule, parse_rule, replace_atoms
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "replace_atoms")
+
+RULES = [
+    ["Cl:1=Au", "Cl:2=Ag"],
+    ["Cl~H:1=Au", "Cl~H:2=Ag"],
+    ["Cl~O:3=Au", "O:1=S", "Cl:3=Ag"],
+    ["H~H:1=He"],
+    ["Cl:1=Au", "Cl~H:1=Ag"],
+    ["O:9=S", "Xe~H:1=Au", "Cl~Xe:1=Au"],
+]
+
+
+def reference(molecule, text):
+    """Returns the index of the atom selected by a rule, searched atom by atom"""
+    match = replace._RULE.match(text)
+    symbol, neighbour, position = match.group("symbol", "neighbour", "position")
+    position = int(position or 1)
+    symbols = molecule.symbols
+    candidates = [index for index, atom in enumerate(symbols) if atom == symbol]
+    if neighbour is None:
+        return candidates[position - 1] if len(candidates) >= position else None
+    neighbours = [index for index, atom in enumerate(symbols) if atom == neighbour]
+    if len(candidates) < position or not neighbours:
+        return None
+    coordinates = molecule.coordinates
+
+    def distance(candidate):
+        return min([np.linalg.norm(coordinates[candidate] - coordinates[other])
+                    for other in neighbours if other != candidate] or [np.inf])
+
+    return sorted(candidates, key=lambda candidate: (distance(candidate), candidate))[position - 1]
+
+
+@pytest.mark.parametrize(
+    "text, rule",
+    [("Cl:2=Ag", OccurrenceRule), (" Cl : 2 = Ag ", OccurrenceRule), ("Cl~H=Au", NearestRule),
+     ("Cl~H:3=Au", NearestRule)],
+)
+def test_parse_rule(text, rule):
+    assert isinstance(parse_rule(text), rule)
+
+
+@pytest.mark.parametrize("text", ["Cl=Au", "Cl:0=Au", "Cl~H:0=Au", "Xx:1=Au", "Cl:1=Xx", "Cl:1", "Cl-H:1=Au"])
+def test_invalid_rules(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+@pytest.mark.parametrize("texts", RULES, ids=" ".join)
+@pytest.mark.parametrize("block_size", [50, 1 << 22])
+def test_rules_match_the_atom_by_atom_search(example_file, monkeypatch, texts, block_size):
+    monkeypatch.setattr(replace, "BLOCK_SIZE", block_size)
+    with open(example_file) as infile:
+        molecules = read_ensemble(infile)
+    replaced = replace_atoms(molecules, [parse_rule(text) for text in texts])
+    for molecule, result in zip(molecules, replaced):
+        expected = list(molecule.symbols)
+        # All rules see the original symbols, the later rule wins
+        for text in texts:
+            index = reference(molecule, text)
+            if index is not None:
+                expected[index] = text.rpartition("=")[2]
+        assert result.symbols == expected
+    assert np.array_equal(replaced.coordinates, molecules.coordinates)
+    assert replaced.labels.tolist() == molecules.labels.tolist()
+
+
+def test_replace_atoms_gives_the_example_output():
+    result = CliRunner().invoke(main, [
+        "replace-atoms", "-r", "Cl:1=Au", "-r", "Cl:2=Ag", os.path.join(EXAMPLES, "HCl_input.molden")
+    ])
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(EXAMPLES, "HCl_output.molden")) as infile:
+        expected = read_ensemble(infile)
+    written = read_ensemble(result.output.splitlines(True))
+    assert written.numbers.tolist() == expected.numbers.tolist()
+    assert np.allclose(written.coordinates, expected.coordinates)
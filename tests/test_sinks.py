@@ -0,0 +1,125 @@
+# Standard Library
+import csv
+import gzip
+
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol.sinks import _Sink, format_of, open_sink
+
+
+def batches():
+    # The string columns have one width in every batch, like the types of the hydrogen bond scan
+    yield {"molecules": np.array([0, 0, 1]), "q1s": np.array([0.5, -0.25, 1.0]), "types": np.array(["O-H-O"] * 3, "<U8")}
+    yield {"molecules": np.array([], dtype=int), "q1s": np.array([]), "types": np.array([], "<U8")}
+    yield {"molecules": np.array([2, 3]), "q1s": np.array([0.125, 2.0]), "types": np.array(["O-H-Cl", "O-H-O"], "<U8")}
+
+
+def concatenated():
+    tables = list(batches())
+    return {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+
+
+def write(filename, fileformat=None, tables=None):
+    with open_sink(filename, fileformat) as sink:
+        for table in batches() if tables is None else tables:
+            sink.write(table)
+    return sink
+
+
+@pytest.mark.parametrize(
+    "filename, fileformat",
+    [("a.csv", "csv"), ("a.csv.gz", "csv"), ("a.npy", "npy"), ("a.parquet", "parquet"),
+     ("a.feather", "arrow"), ("a.txt", None), (None, None)],
+)
+def test_format_of(filename, fileformat):
+    assert format_of(filename) == fileformat
+
+
+@pytest.mark.parametrize("suffix, opener", [(".csv", open), (".csv.gz", gzip.open)])
+def test_csv_round_trip(tmp_path, suffix, opener):
+    filename = str(tmp_path / ("results" + suffix))
+    assert write(filename).rows == 5
+    with opener(filename, "rt") as infile:
+        rows = list(csv.reader(infile))
+    expected = concatenated()
+    assert rows[0] == list(expected)
+    assert [int(row[0]) for row in rows[1:]] == expected["molecules"].tolist()
+    assert [float(row[1]) for row in rows[1:]] == expected["q1s"].tolist()
+    assert [row[2] for row in rows[1:]] == expected["types"].tolist()
+
+
+def test_npy_header_counts_the_rows_of_all_batches(tmp_path):
+    filename = str(tmp_path / "results.npy")
+    write(filename)
+    table = np.load(filename)
+    expected = concatenated()
+    assert table.shape == (5,)
+    assert table.dtype.names == tuple(expected)
+    for name, values in expected.items():
+        assert table[name].tolist() == values.tolist()
+
+
+def test_npy_without_rows(tmp_path):
+    filename = str(tmp_path / "results.npy")
+    write(filename, tables=[{"molecules": np.array([], dtype=int), "types": np.array([], dtype="<U5")}])
+    table = np.load(filename)
+    assert table.shape == (0,)
+    assert table.dtype.names == ("molecules", "types")
+
+
+def test_npy_rejects_longer_strings_than_the_first_batch(tmp_path):
+    filename = tmp_path / "results.npy"
+    tables = [{"types": np.array(["O-H-O"])}, {"types": np.array(["Cl-H-Cl"])}]
+    with pytest.raises(ValueError):
+        write(str(filename), tables=tables)
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("fileformat", ["parquet", "arrow"])
+def test_pyarrow_round_trip(tmp_path, fileformat):
+    pyarrow = pytest.importorskip("pyarrow")
+    filename = str(tmp_path / ("results." + fileformat))
+    write(filename, fileformat)
+    if fileformat == "parquet":
+        # Third Party Libraries
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(filename)
+    else:
+        # Third Party Libraries
+        import pyarrow.ipc
+
+        table = pyarrow.ipc.open_file(filename).read_all()
+    assert table.to_pydict() == {name: values.tolist() for name, values in concatenated().items()}
+
+
+@pytest.mark.parametrize("fileformat", ["npy", "parquet", "arrow"])
+def test_binary_formats_need_a_file(fileformat):
+    with pytest.raises(ValueError):
+        open_sink("-", fileformat)
+
+
+def test_table_is_printed_once(capsys):
+    pytest.importorskip("pandas")
+    write(None)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["molecules", "q1s", "types"]
+    assert len(lines) == 6
+
+
+def test_nothing_is_written_on_error(tmp_path, capsys):
+    for filename in [str(tmp_path / "results.csv"), None]:
+        with pytest.raises(RuntimeError):
+            with open_sink(filename) as sink:
+                sink.write(next(batches()))
+                raise RuntimeError("analysis failed")
+    assert list(tmp_path.iterdir()) == []
+    assert capsys.readouterr().out == ""
+
+
+def test_sinks_implement_write():
+    with pytest.raises(TypeError):
+        _Sink()
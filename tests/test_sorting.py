@@ -0,0 +1,47 @@
+# Third Party Libraries
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+# My Stuff
+from tidymol import sorting
+from tidymol.cli import main
+from tidymol.parsers.molden import Molecule, read_ensemble
+from tidymol.sorting import argsort_energies, lowest_energies
+
+# Many equal energies, whose frames have to keep their order
+ENERGIES = np.random.RandomState(3).randint(-20, 20, size=500) / 4.0
+
+
+@pytest.mark.parametrize("max_keys", [None, 1, 3, 64, 499, 500, 10000])
+@pytest.mark.parametrize("block_size", [1, 5, 1 << 14])
+def test_argsort_is_stable_with_any_number_of_runs(monkeypatch, max_keys, block_size):
+    monkeypatch.setattr(sorting, "RUN_BLOCK_SIZE", block_size)
+    expected = sorted(range(len(ENERGIES)), key=lambda position: (ENERGIES[position], position))
+    assert list(argsort_energies(ENERGIES, max_keys)) == expected
+
+
+def test_argsort_without_frames():
+    assert list(argsort_energies(np.zeros(0), 2)) == []
+
+
+@pytest.mark.parametrize("k", [1, 7, 500, 600])
+def test_lowest_energies(k):
+    molecules = [Molecule(str(position), energy, [1], [[0.0, 0.0, 0.0]]) for position, energy in enumerate(ENERGIES)]
+    expected = sorted(molecules, key=lambda molecule: (molecule.energy, int(molecule.label)))[:k]
+    assert [molecule.label for molecule in lowest_energies(iter(molecules), k)] == [
+        molecule.label for molecule in expected
+    ]
+
+
+@pytest.mark.parametrize("options", [["--max-keys", "2"], ["--max-keys", "3", "--top", "4"], ["--top", "1000"]])
+def test_sort_matches_the_sorted_ensemble(example_file, options):
+    with open(example_file) as infile:
+        expected = read_ensemble(infile).sorted()
+    if "--top" in options:
+        expected = expected[:int(options[options.index("--top") + 1])]
+    result = CliRunner().invoke(main, ["sort"] + options + [example_file])
+    assert result.exit_code == 0, result.output
+    written = read_ensemble(result.output.splitlines(True))
+    assert written.labels.tolist() == expected.labels.tolist()
+    assert np.allclose(written.coordinates, expected.coordinates)
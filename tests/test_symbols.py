@@ -0,0 +1,54 @@
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol.constants import NUMBERS, SYMBOLS, atomic_number
+from tidymol.parsers.molden import read_ensemble, symbol_mask
+
+QUERIES = ["H", "O", "Cl", ["O", "Cl"], ["H", "Xx"], "Xx", [], ("Cl", "Cl")]
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+def selected(query):
+    return [query] if isinstance(query, str) else list(query)
+
+
+def test_numbers_are_the_positions_in_the_table():
+    assert all(SYMBOLS[NUMBERS[symbol]] == symbol for symbol in SYMBOLS)
+    assert atomic_number("Cl") == 17
+    with pytest.raises(ValueError):
+        atomic_number("Xx")
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=str)
+def test_symbol_mask(molecules, query):
+    symbols = [symbol for molecule in molecules for symbol in molecule.symbols]
+    expected = [symbol in selected(query) for symbol in symbols]
+    assert symbol_mask(molecules.numbers, query).tolist() == expected
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=str)
+def test_symbol_queries_of_the_ensemble(molecules, query):
+    frames, indexes = molecules.get_indexes_by_symbol(query)
+    expected = [(frame, index) for frame, molecule in enumerate(molecules)
+                for index, symbol in enumerate(molecule.symbols) if symbol in selected(query)]
+    assert list(zip(frames.tolist(), indexes.tolist())) == expected
+    assert molecules.count_symbol(query).tolist() == [
+        sum(symbol in selected(query) for symbol in molecule.symbols) for molecule in molecules
+    ]
+
+
+@pytest.mark.parametrize("query", QUERIES, ids=str)
+def test_symbol_queries_of_a_molecule(molecules, query):
+    molecule = molecules[len(molecules) // 2]
+    expected = [index for index, symbol in enumerate(molecule.symbols) if symbol in selected(query)]
+    assert molecule.get_indexes_by_symbol(query).tolist() == expected
+    atoms = molecule.get_atoms_by_symbol(query)
+    assert [atom.symbol for atom in atoms] == [molecule.symbols[index] for index in expected]
+    assert np.array_equal(np.reshape([atom.coordinates for atom in atoms], (-1, 3)), molecule.coordinates[expected])
@@ -0,0 +1,52 @@
+# Standard Library
+import io
+
+# Third Party Libraries
+import numpy as np
+import pytest
+
+# My Stuff
+from tidymol.parsers.molden import MoleculeEnsemble, read_ensemble
+from tidymol.parsers.molden import writer
+from tidymol.parsers.molden.writer import write_molden
+
+
+def old_format(molecule):
+    """The output of print(molecule) before the block writer"""
+    text = "{}\n".format(molecule.number_of_atoms)
+    text += "{0:<12.9f}     {1}\n".format(molecule.energy, molecule.label)
+    for symbol, (x, y, z) in zip(molecule.symbols, molecule.coordinates):
+        text += "{0:<2}{sep}{1:>12.9f}{sep}{2:>12.9f}{sep}{3:>12.9f}\n".format(
+            symbol, np.around(x, 9), np.around(y, 9), np.around(z, 9), sep=" " * 5
+        )
+    return text + "\n"
+
+
+@pytest.fixture
+def molecules(example_file):
+    with open(example_file) as infile:
+        return read_ensemble(infile)
+
+
+def test_ensemble_output_matches_old_format(molecules):
+    outfile = io.StringIO()
+    assert write_molden(outfile, molecules) == (len(molecules), len(molecules.numbers))
+    assert outfile.getvalue() == "".join(old_format(molecule) for molecule in molecules)
+
+
+def test_molecule_output_matches_old_format(molecules, monkeypatch):
+    # Small blocks split the molecules over several blocks
+    monkeypatch.setattr(writer, "BLOCK_SIZE", 16)
+    outfile = io.StringIO()
+    write_molden(outfile, iter(molecules))
+    assert outfile.getvalue() == "".join(old_format(molecule) for molecule in molecules)
+
+
+def test_rounding_and_negative_zero():
+    molecules = MoleculeEnsemble.from_frames([
+        ("label with  spaces", -1234.5678901234, ["H", "Cl"], [(-1e-12, 0.0, 1e-10), (1.0000000005, -2.5, 123.456789)]),
+        ("", 0, ["Au"], [(-0.0, 5e-10, -5e-10)]),
+    ])
+    outfile = io.StringIO()
+    write_molden(outfile, molecules)
+    assert outfile.getvalue() == "".join(old_format(molecule) for molecule in molecules)